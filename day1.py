@@ -1,8 +1,22 @@
 #!/usr/bin/env python
 
+from array import array
 from collections import Counter
+from heapq import merge
+from itertools import repeat
+from bisect import bisect_left, insort
+import mmap
+from operator import mul, sub
+import os
+import random
+import tempfile
 import unittest
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def calculate_total_distance(left_list: list[int],
                              right_list: list[int]) -> int:
@@ -31,6 +45,234 @@ def load_lists_from_file(file_path: str) -> tuple[list[int], list[int]]:
     return left_list, right_list
 
 
+def load_arrays_from_file(file_path: str,
+                          chunk_size: int = 1 << 20) -> tuple[array, array]:
+    """Load both lists into int64 arrays by parsing a memory-mapped file.
+
+    The file is split on whitespace a chunk at a time (cut at a newline), so
+    only the two 8-byte-per-value arrays grow with the input size.
+    """
+    left_array = array('q')
+    right_array = array('q')
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return left_array, right_array
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            size = len(data)
+            while start < size:
+                end = data.find(b'\n', min(start + chunk_size, size))
+                end = size if end == -1 else end + 1
+                numbers = data[start:end].split()
+                left_array.extend(map(int, numbers[0::2]))
+                right_array.extend(map(int, numbers[1::2]))
+                start = end
+    return left_array, right_array
+
+
+def calculate_total_distance_arrays(left_array: array,
+                                    right_array: array) -> int:
+    """Calculate the total distance on int64 arrays without per-pair loops.
+
+    With NumPy the arrays are sorted as int64 buffers and the differences are
+    taken in place, so the extra memory is the two sorted copies (16 bytes
+    per pair).  Without it the fallback sorts through Python ints, which
+    costs roughly 56 bytes per pair on top of the input arrays.
+    """
+    if np is not None:
+        left_sorted = np.sort(np.frombuffer(left_array, dtype=np.int64))
+        right_sorted = np.sort(np.frombuffer(right_array, dtype=np.int64))
+        np.subtract(left_sorted, right_sorted, out=left_sorted)
+        np.abs(left_sorted, out=left_sorted)
+        return int(left_sorted.sum())
+    return _calculate_total_distance_fallback(left_array, right_array)
+
+
+def _calculate_total_distance_fallback(left_array: array,
+                                       right_array: array) -> int:
+    left_sorted = array('q', sorted(left_array))
+    right_sorted = array('q', sorted(right_array))
+    return sum(map(abs, map(sub, left_sorted, right_sorted)))
+
+
+def calculate_similarity_score_arrays(left_array: array,
+                                      right_array: array) -> int:
+    """Calculate the similarity score on int64 arrays using a histogram.
+
+    With NumPy both sides are reduced to sorted (value, count) arrays and
+    matched with searchsorted, so the extra memory stays within a few int64
+    copies of the input.  Without it the fallback builds a Counter of Python
+    ints, which costs roughly 43 bytes per pair on top of the input arrays.
+    """
+    if np is not None:
+        left_values, left_counts = np.unique(
+            np.frombuffer(left_array, dtype=np.int64), return_counts=True)
+        right_values, right_counts = np.unique(
+            np.frombuffer(right_array, dtype=np.int64), return_counts=True)
+        positions = np.searchsorted(right_values, left_values)
+        found = positions < len(right_values)
+        found[found] = right_values[positions[found]] == left_values[found]
+        # The products can exceed int64, so they are summed as Python ints
+        return sum(map(mul, map(mul, left_values[found].tolist(),
+                                left_counts[found].tolist()),
+                       right_counts[positions[found]].tolist()))
+    return _calculate_similarity_score_fallback(left_array, right_array)
+
+
+def _calculate_similarity_score_fallback(left_array: array,
+                                         right_array: array) -> int:
+    right_counts = Counter(right_array)
+    return sum(map(mul, left_array, map(right_counts.get, left_array,
+                                        repeat(0))))
+
+
+def _write_run(values: list[int], directory: str) -> str:
+    """Sort values and spill them to a temporary file as raw int64."""
+    values.sort()
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.run',
+                                     delete=False) as run_file:
+        array('q', values).tofile(run_file)
+    return run_file.name
+
+
+def _read_run(run_path: str, buffer_size: int):
+    """Stream the int64 values of a spilled run in fixed-size blocks."""
+    with open(run_path, 'rb') as run_file:
+        while True:
+            block = array('q')
+            block.frombytes(run_file.read(buffer_size * block.itemsize))
+            if not block:
+                return
+            yield from block
+
+
+def _merge_runs(run_paths: list[str], directory: str,
+                buffer_size: int) -> str:
+    """K-way merge spilled runs into one new run and delete the inputs."""
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.run',
+                                     delete=False) as run_file:
+        block = array('q')
+        for value in merge(*(_read_run(run, buffer_size)
+                             for run in run_paths)):
+            block.append(value)
+            if len(block) >= buffer_size:
+                block.tofile(run_file)
+                block = array('q')
+        block.tofile(run_file)
+    for run in run_paths:
+        os.remove(run)
+    return run_file.name
+
+
+def _reduce_runs(run_paths: list[str], directory: str, buffer_size: int,
+                 fan_in: int) -> list[str]:
+    """Merge runs in groups of fan_in until at most fan_in are left."""
+    while len(run_paths) > fan_in:
+        run_paths = [_merge_runs(run_paths[i:i + fan_in], directory,
+                                 buffer_size)
+                     for i in range(0, len(run_paths), fan_in)]
+    return run_paths
+
+
+def calculate_total_distance_external(file_path: str,
+                                      run_size: int = 1_000_000,
+                                      buffer_size: int = 8192,
+                                      fan_in: int = 64) -> int:
+    """Calculate the total distance for inputs that do not fit in memory.
+
+    Both columns are split into sorted runs of at most run_size values that
+    are spilled to temporary files, then the runs of each side are k-way
+    merged in lockstep. Sides with more than fan_in runs are first merged in
+    groups of fan_in, so at most 2 * fan_in run files are open at once.
+    Peak memory is bounded by two runs while splitting and by one
+    buffer_size block per open run while merging.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        left_runs = []
+        right_runs = []
+        left_list = []
+        right_list = []
+        with open(file_path) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                left, right = map(int, line.split())
+                left_list.append(left)
+                right_list.append(right)
+                if len(left_list) >= run_size:
+                    left_runs.append(_write_run(left_list, directory))
+                    right_runs.append(_write_run(right_list, directory))
+                    left_list = []
+                    right_list = []
+        if left_list:
+            left_runs.append(_write_run(left_list, directory))
+            right_runs.append(_write_run(right_list, directory))
+        left_runs = _reduce_runs(left_runs, directory, buffer_size, fan_in)
+        right_runs = _reduce_runs(right_runs, directory, buffer_size, fan_in)
+
+        left_merged = merge(*(_read_run(run, buffer_size)
+                              for run in left_runs))
+        right_merged = merge(*(_read_run(run, buffer_size)
+                               for run in right_runs))
+        return sum(map(abs, map(sub, left_merged, right_merged)))
+
+
+class LocationIndex:
+    """Keep both lists indexed so the answers follow small updates.
+
+    The similarity score is maintained in O(1) per update from the value
+    counts of both lists.  Both lists are kept sorted with bisect (the order
+    statistics needed for pairing), so the total distance never needs a
+    re-sort; it is recomputed by one linear pass over the sorted lists the
+    first time it is read after a change.
+    """
+
+    def __init__(self, left_list: list[int] = (),
+                 right_list: list[int] = ()):
+        self.left_sorted = sorted(left_list)
+        self.right_sorted = sorted(right_list)
+        self.left_counter = Counter(self.left_sorted)
+        self.right_counter = Counter(self.right_sorted)
+        self.similarity_score = calculate_similarity_score(
+            self.left_sorted, self.right_sorted)
+        self._total_distance = None
+
+    def add_left(self, value: int) -> None:
+        insort(self.left_sorted, value)
+        self.left_counter[value] += 1
+        self.similarity_score += value * self.right_counter[value]
+        self._total_distance = None
+
+    def add_right(self, value: int) -> None:
+        insort(self.right_sorted, value)
+        self.right_counter[value] += 1
+        self.similarity_score += value * self.left_counter[value]
+        self._total_distance = None
+
+    def remove_left(self, value: int) -> None:
+        if not self.left_counter[value]:
+            raise ValueError(f"{value} is not in the left list")
+        del self.left_sorted[bisect_left(self.left_sorted, value)]
+        self.left_counter[value] -= 1
+        self.similarity_score -= value * self.right_counter[value]
+        self._total_distance = None
+
+    def remove_right(self, value: int) -> None:
+        if not self.right_counter[value]:
+            raise ValueError(f"{value} is not in the right list")
+        del self.right_sorted[bisect_left(self.right_sorted, value)]
+        self.right_counter[value] -= 1
+        self.similarity_score -= value * self.left_counter[value]
+        self._total_distance = None
+
+    @property
+    def total_distance(self) -> int:
+        if self._total_distance is None:
+            self._total_distance = sum(
+                map(abs, map(sub, self.left_sorted, self.right_sorted)))
+        return self._total_distance
+
+
 if __name__ == "__main__":
     file_path = 'input1.txt'
     left_list, right_list = load_lists_from_file(file_path)
@@ -59,6 +301,85 @@ class TestCalculations(unittest.TestCase):
         self.assertEqual(left_list, [3, 4, 2, 1, 3, 3])
         self.assertEqual(right_list, [4, 3, 5, 3, 9, 3])
 
+    def test_array_variants(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as file:
+            file.write("3   4\n4   3\n2   5\n1   3\n3   9\n3   3\n")
+        try:
+            left_array, right_array = load_arrays_from_file(file.name,
+                                                            chunk_size=4)
+        finally:
+            os.remove(file.name)
+        self.assertEqual(left_array, array('q', [3, 4, 2, 1, 3, 3]))
+        self.assertEqual(right_array, array('q', [4, 3, 5, 3, 9, 3]))
+        self.assertEqual(
+            calculate_total_distance_arrays(left_array, right_array), 11)
+        self.assertEqual(
+            calculate_similarity_score_arrays(left_array, right_array), 31)
+        self.assertEqual(
+            _calculate_total_distance_fallback(left_array, right_array), 11)
+        self.assertEqual(
+            _calculate_similarity_score_fallback(left_array, right_array), 31)
+        self.assertEqual(
+            calculate_similarity_score_arrays(array('q', [1, 7, 9]),
+                                              array('q', [2, 7, 7])), 14)
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_array_variants_numpy(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            size = rng.randint(0, 30)
+            left_array = array('q', (rng.randint(0, 9) for _ in range(size)))
+            right_array = array('q', (rng.randint(0, 9) for _ in range(size)))
+            self.assertEqual(
+                calculate_total_distance_arrays(left_array, right_array),
+                _calculate_total_distance_fallback(left_array, right_array))
+            self.assertEqual(
+                calculate_similarity_score_arrays(left_array, right_array),
+                _calculate_similarity_score_fallback(left_array, right_array))
+        # 2**40 * 4096 * 4096 overflows int64
+        left_array = array('q', [1 << 40]) * 4096
+        self.assertEqual(
+            calculate_similarity_score_arrays(left_array, left_array), 1 << 64)
+
+    def test_calculate_total_distance_external(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as file:
+            file.write("3   4\n4   3\n2   5\n1   3\n3   9\n3   3\n")
+        try:
+            for run_size in (1, 2, 4, 100):
+                self.assertEqual(
+                    calculate_total_distance_external(file.name,
+                                                      run_size=run_size,
+                                                      buffer_size=1), 11)
+            for fan_in in (2, 3):
+                self.assertEqual(
+                    calculate_total_distance_external(file.name, run_size=1,
+                                                      buffer_size=2,
+                                                      fan_in=fan_in), 11)
+        finally:
+            os.remove(file.name)
+
+    def test_location_index(self):
+        left_list = [3, 4, 2, 1, 3, 3]
+        right_list = [4, 3, 5, 3, 9, 3]
+        index = LocationIndex(left_list, right_list)
+        self.assertEqual(index.total_distance, 11)
+        self.assertEqual(index.similarity_score, 31)
+
+        index.add_left(5)
+        index.add_right(3)
+        index.remove_left(1)
+        index.remove_right(9)
+        left_list = [3, 4, 2, 3, 3, 5]
+        right_list = [4, 3, 5, 3, 3, 3]
+        self.assertEqual(index.total_distance,
+                         calculate_total_distance(left_list, right_list))
+        self.assertEqual(index.similarity_score,
+                         calculate_similarity_score(left_list, right_list))
+        with self.assertRaises(ValueError):
+            index.remove_left(1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,19 @@
 #!/usr/bin/env python
 
+from array import array
+from itertools import accumulate, repeat
+from operator import sub
+import os
+import random
+import re
+import tempfile
 import unittest
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def is_increasing_or_decreasing(row):
     return all(row[i] < row[i + 1] for i in range(len(row) - 1)) or \
@@ -22,17 +34,51 @@ def calculate_safe_lists(list_of_lists) -> int:
     return sum(1 for row in list_of_lists if is_safe(row))
 
 
+def _is_valid_step(a, b, sign):
+    return 1 <= (b - a) * sign <= 3
+
+
+def _dampener_removal_for_sign(row, sign):
+    # Pair k is (row[k], row[k + 1]); locate the first and last bad pair
+    first_bad = last_bad = None
+    for k in range(len(row) - 1):
+        if not _is_valid_step(row[k], row[k + 1], sign):
+            if first_bad is None:
+                first_bad = k
+            last_bad = k
+    if first_bad is None:
+        return True, None
+    # Removing level i drops pairs i - 1 and i and bridges row[i - 1] to
+    # row[i + 1]; the prefix before and suffix after must already be valid
+    for i in (first_bad, first_bad + 1):
+        if first_bad < i - 1 or last_bad > i:
+            continue
+        if 0 < i < len(row) - 1 and not _is_valid_step(row[i - 1],
+                                                        row[i + 1], sign):
+            continue
+        return True, i
+    return False, None
+
+
+def find_dampener_removal(row):
+    """Decide dampened safety in O(n) without copying the row.
+
+    Returns (safe, index) where index is the level that has to be removed,
+    or None when the row is safe as it is (or cannot be made safe).
+    """
+    removal_index = None
+    for sign in (1, -1):
+        safe, index = _dampener_removal_for_sign(row, sign)
+        if safe and index is None:
+            return True, None
+        if safe and removal_index is None:
+            removal_index = index
+    return removal_index is not None, removal_index
+
+
 def is_safe_dampener(row):
-    # Check if the row is already safe
-    if is_increasing_or_decreasing(row) and has_valid_differences(row):
-        return True
-    # Check if removing one level makes it safe
-    for i in range(len(row)):
-        modified_row = row[:i] + row[i + 1:]  # Remove the i-th level
-        if is_increasing_or_decreasing(modified_row) and has_valid_differences(
-                modified_row):
-            return True
-    return False
+    safe, _ = find_dampener_removal(row)
+    return safe
 
 
 def count_safe_reports(list_of_lists):
@@ -53,6 +99,132 @@ def load_list_of_lists(filename):
     return list_of_lists
 
 
+# Step code per difference: 1 = valid increase, 2 = valid decrease
+_STEP_CODES = {1: 1, 2: 1, 3: 1, -1: 2, -2: 2, -3: 2}
+# Step code written over the step that joins one report to the next
+_REPORT_BREAK = 0xFF
+# A report's run of step codes is unsafe if it has a step that is not a valid
+# increase and one that is not a valid decrease (an invalid step is both)
+_UNSAFE_STEPS = re.compile(
+    rb'(?:^|(?<=\xff))(?=[^\xff]*[\x00\x02])(?=[^\xff]*[\x00\x01])[^\xff]+')
+
+
+def pack_reports(list_of_lists):
+    """Pack ragged reports into one flat int64 array plus an offsets array.
+
+    Report i is values[offsets[i]:offsets[i + 1]].
+    """
+    values = array('q')
+    for row in list_of_lists:
+        values.extend(row)
+    offsets = array('q', [0])
+    offsets.extend(accumulate(map(len, list_of_lists)))
+    return values, offsets
+
+
+def load_packed_reports(filename):
+    """Load a report file straight into the packed (values, offsets) form."""
+    values = array('q')
+    offsets = array('q', [0])
+    with open(filename, 'rb') as file:
+        for line in file:
+            values.extend(map(int, line.split()))
+            offsets.append(len(values))
+    return values, offsets
+
+
+def _packed_dampener_safe(values, start, steps) -> bool:
+    # Same prefix/suffix argument as find_dampener_removal, with the first
+    # and last bad step found by stripping the report's step codes
+    last_level = len(steps)
+    for code in (1, 2):
+        code_byte = bytes((code,))
+        first_bad = len(steps) - len(steps.lstrip(code_byte))
+        last_bad = len(steps.rstrip(code_byte)) - 1
+        for i in (first_bad, first_bad + 1):
+            if first_bad < i - 1 or last_bad > i:
+                continue
+            if 0 < i < last_level and _STEP_CODES.get(
+                    values[start + i + 1] - values[start + i - 1]) != code:
+                continue
+            return True
+    return False
+
+
+def _count_safe_packed_numpy(values, offsets, dampener):
+    levels = np.frombuffer(values, dtype=np.int64)
+    bounds = np.frombuffer(offsets, dtype=np.int64)
+    starts, ends = bounds[:-1], bounds[1:]
+    # Step k joins levels k and k + 1, so report i owns steps
+    # [starts[i], ends[i] - 1); the step joining two reports is never counted
+    step_ends = np.maximum(ends - 1, starts)
+    diffs = np.diff(levels)
+    safe = np.zeros(len(starts), dtype=bool)
+    for low, high in ((1, 3), (-3, -1)):
+        # One unsigned comparison: differences below low wrap around to huge
+        bad = (diffs - low).view(np.uint64) > high - low
+        # bad_before[k] is the number of bad steps before step k, which is
+        # also the index in bad_steps of the first bad step from k onwards;
+        # it runs up to k = len(levels) so that every report start is valid
+        bad_before = np.zeros(len(levels) + 1, dtype=np.int64)
+        np.cumsum(bad, out=bad_before[1:len(bad) + 1])
+        bad_before[len(bad) + 1:] = bad_before[len(bad)]
+        first = bad_before[starts]
+        bad_count = bad_before[step_ends] - first
+        safe |= bad_count == 0
+        if not dampener:
+            continue
+        # Same prefix/suffix argument as find_dampener_removal: at most two
+        # adjacent bad steps, dropped by removing level first_bad or the one
+        # after it, whose neighbours must then be bridged by a valid step
+        bad_steps = np.flatnonzero(bad)
+        candidates = np.flatnonzero((bad_count == 1) | (bad_count == 2))
+        first_bad = bad_steps[first[candidates]]
+        last_bad = bad_steps[first[candidates] + bad_count[candidates] - 1]
+        report_starts, report_ends = starts[candidates], ends[candidates]
+        for removed in (first_bad, first_bad + 1):
+            inside = (removed > report_starts) & (removed < report_ends - 1)
+            bridge = (levels[np.minimum(removed + 1, report_ends - 1)]
+                      - levels[np.maximum(removed - 1, report_starts)])
+            bridged = (bridge >= low) & (bridge <= high)
+            safe[candidates[(last_bad <= removed) & (~inside | bridged)]] = True
+    return int(safe.sum())
+
+
+def _count_safe_packed_fallback(values, offsets, dampener):
+    step_codes = bytearray(map(_STEP_CODES.get,
+                               map(sub, values[1:], values[:-1]), repeat(0)))
+    for end in offsets:
+        if 0 < end < len(values):
+            step_codes[end - 1] = _REPORT_BREAK
+    safe_count = len(offsets) - 1
+    if not dampener:
+        return safe_count - len(_UNSAFE_STEPS.findall(step_codes))
+    for match in _UNSAFE_STEPS.finditer(step_codes):
+        safe_count -= not _packed_dampener_safe(values, match.start(),
+                                                match.group())
+    return safe_count
+
+
+def count_safe_packed(values, offsets, dampener=False) -> int:
+    """Count safe reports of a packed batch.
+
+    With NumPy the differences of the whole flat array are taken at once and
+    the bad steps of every report are counted from a running count of bad
+    steps read at the report bounds; the dampened variant checks the two
+    possible removals of all reports with at most two bad steps at once.
+
+    Without it, step codes are computed for the flat array in one pass, with
+    the steps between reports overwritten by a break code.  The unsafe
+    reports are then found by one regex scan over the flat codes, so safe
+    reports are never visited; the dampened variant checks just the unsafe
+    ones, using the matched codes and without copying any report.
+    """
+    if np is not None:
+        return _count_safe_packed_numpy(values, offsets, dampener)
+    return _count_safe_packed_fallback(values, offsets, dampener)
+
+
 if __name__ == "__main__":
     file_path = 'input2.txt'
     list_of_lists = load_list_of_lists(file_path)
@@ -62,6 +234,13 @@ if __name__ == "__main__":
     )
 
 
+def _random_reports(rng, count, min_levels, max_levels):
+    """Random reports of levels 1..12 for the differential tests."""
+    return [[rng.randint(1, 12)
+             for _ in range(rng.randint(min_levels, max_levels))]
+            for _ in range(count)]
+
+
 class TestCalculations(unittest.TestCase):
 
     def test_calculate_safe_lists(self):
@@ -74,6 +253,70 @@ class TestCalculations(unittest.TestCase):
                    [1, 3, 2, 4, 5], [8, 6, 4, 4, 1], [1, 3, 6, 7, 9]]
         self.assertEqual(calculate_safe_lists_dampener(in_list), 4)
 
+    def test_find_dampener_removal(self):
+        self.assertEqual(find_dampener_removal([7, 6, 4, 2, 1]), (True, None))
+        self.assertEqual(find_dampener_removal([1, 2, 7, 8, 9]), (False, None))
+        self.assertEqual(find_dampener_removal([1, 3, 2, 4, 5]), (True, 1))
+        self.assertEqual(find_dampener_removal([8, 6, 4, 4, 1]), (True, 2))
+        self.assertEqual(find_dampener_removal([9, 1, 2, 3]), (True, 0))
+        self.assertEqual(find_dampener_removal([1, 2, 3, 9]), (True, 3))
+
+    def test_count_safe_packed(self):
+        in_list = [[7, 6, 4, 2, 1], [1, 2, 7, 8, 9], [9, 7, 6, 2, 1],
+                   [1, 3, 2, 4, 5], [8, 6, 4, 4, 1], [1, 3, 6, 7, 9], [5],
+                   [9, 1, 2, 3], [1, 2, 3, 9], [1, 5, 2, 3], []]
+        values, offsets = pack_reports(in_list)
+        self.assertEqual(offsets[-1], len(values))
+        self.assertEqual(count_safe_packed(values, offsets),
+                         calculate_safe_lists(in_list))
+        self.assertEqual(count_safe_packed(values, offsets, dampener=True),
+                         calculate_safe_lists_dampener(in_list))
+        for dampener in (False, True):
+            self.assertEqual(
+                _count_safe_packed_fallback(values, offsets, dampener),
+                count_safe_packed(values, offsets, dampener))
+
+    @unittest.skipUnless(np is not None, "NumPy is not installed")
+    def test_count_safe_packed_numpy(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            in_list = _random_reports(rng, rng.randint(0, 12), 0, 7)
+            values, offsets = pack_reports(in_list)
+            self.assertEqual(_count_safe_packed_numpy(values, offsets, False),
+                             calculate_safe_lists(in_list), in_list)
+            self.assertEqual(_count_safe_packed_numpy(values, offsets, True),
+                             calculate_safe_lists_dampener(in_list), in_list)
+
+    def test_load_packed_reports(self):
+        in_list = [[7, 6, 4, 2, 1], [1, 3, 2, 4, 5], [5], [9, 1, 2, 3]]
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as file:
+            file.write("".join(" ".join(map(str, row)) + "\n"
+                               for row in in_list))
+        try:
+            values, offsets = load_packed_reports(file.name)
+        finally:
+            os.remove(file.name)
+        self.assertEqual((values, offsets), pack_reports(in_list))
+        self.assertEqual(count_safe_packed(values, offsets, dampener=True), 4)
+
+    def test_dampener_matches_slice_and_retry(self):
+        def slice_and_retry(row):
+            return any(
+                is_increasing_or_decreasing(r) and has_valid_differences(r)
+                for r in [row] + [row[:i] + row[i + 1:]
+                                  for i in range(len(row))])
+
+        for row in _random_reports(random.Random(2), 2000, 1, 8):
+            safe, index = find_dampener_removal(row)
+            self.assertEqual(safe, slice_and_retry(row), row)
+            values, offsets = pack_reports([row])
+            self.assertEqual(count_safe_packed(values, offsets, True),
+                             int(safe), row)
+            if index is not None:
+                repaired = row[:index] + row[index + 1:]
+                self.assertTrue(is_safe(repaired), row)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,50 +1,180 @@
 """ Advent Of Code 2024 Day 3"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+import mmap
+import os
 import re
+import tempfile
+from typing import Dict, NamedTuple
 import unittest
 
+# Instruction patterns compiled once; the named group that matched tells
+# the instruction apart without inspecting the matched text again
+_MUL = re.compile(r"mul\((\d+),(\d+)\)")
+_INSTRUCTIONS = re.compile(
+    r"(?P<mul>mul\((?P<x>\d+),(?P<y>\d+)\))|(?P<do>do\(\))|(?P<dont>don't\(\))")
+_INSTRUCTIONS_BYTES = re.compile(_INSTRUCTIONS.pattern.encode())
+_SWITCH_BYTES = re.compile(rb"do\(\)|don't\(\)")
+# Any proper prefix of an instruction that ends the buffer (so it may still
+# be completed by the next chunk)
+_PARTIAL_INSTRUCTION_BYTES = re.compile(
+    rb"(?:m(?:u(?:l(?:\((?:\d+(?:,\d*)?)?)?)?)?"
+    rb"|d(?:o(?:n(?:'(?:t(?:\(\)?)?)?)?|\()?)?)\Z")
+
+
+class InstructionTotals(NamedTuple):
+    part1: int
+    part2: int
+    counts: Dict[str, int]
+    mul_enabled: bool
+    scanned_to: int
+
 
 def extract_and_compute(expression: str) -> int:
     """ part 1 """
-    # Regular expression to match valid mul instructions of the form mul(a,b)
-    pattern = r"mul\((\d+),(\d+)\)"
-    matches = re.findall(pattern, expression)
-    
-    # Perform multiplication for each pair and sum the results
-    result = sum(int(a) * int(b) for a, b in matches)
-    return result
+    return sum(int(a) * int(b) for a, b in _MUL.findall(expression))
 
 
 def compute_with_do_and_dont(memory: str) -> int:
     """ part 2 """
-    # Regular expressions to match valid instructions
-    mul_pattern = r"mul\((\d+),(\d+)\)"
-    do_pattern = r"do\(\)"
-    dont_pattern = r"don't\(\)"
-    
-    # Parse the memory string
-    matches = re.finditer(rf"{mul_pattern}|{do_pattern}|{dont_pattern}", memory)
-    
-    # Initial state
     mul_enabled = True
     total_sum = 0
-    
-    # Process each instruction
-    for match in matches:
-        instruction = match.group(0)
-        if instruction == "do()":
+    for match in _INSTRUCTIONS.finditer(memory):
+        kind = match.lastgroup
+        if kind == "do":
             mul_enabled = True
-        elif instruction == "don't()":
+        elif kind == "dont":
             mul_enabled = False
         elif mul_enabled:
-            # Check for mul(x, y)
-            mul_match = re.match(mul_pattern, instruction)
-            if mul_match:
-                x, y = map(int, mul_match.groups())
-                total_sum += x * y
-    
+            total_sum += int(match.group("x")) * int(match.group("y"))
     return total_sum
 
 
+def run_instructions(buffer, start: int = 0, end: int = None,
+                     mul_enabled: bool = True) -> InstructionTotals:
+    """ Both parts and per-instruction counts from one pass over bytes
+
+    buffer may be bytes, bytearray, memoryview or mmap; it is never decoded.
+    scanned_to is the end of the last instruction found (start if none).
+    """
+    end = len(buffer) if end is None else end
+    part1 = part2 = 0
+    counts = {"mul": 0, "do": 0, "dont": 0}
+    scanned_to = start
+    for match in _INSTRUCTIONS_BYTES.finditer(buffer, start, end):
+        kind = match.lastgroup
+        counts[kind] += 1
+        if kind == "do":
+            mul_enabled = True
+        elif kind == "dont":
+            mul_enabled = False
+        else:
+            product = int(match.group("x")) * int(match.group("y"))
+            part1 += product
+            if mul_enabled:
+                part2 += product
+        scanned_to = match.end()
+    return InstructionTotals(part1, part2, counts, mul_enabled, scanned_to)
+
+
+class InstructionScanner:
+    """ Incremental scanner computing both parts over chunks of bytes
+
+    Complete instructions are consumed as soon as they are seen; a possibly
+    incomplete instruction at the end of a chunk is carried over and scanned
+    again together with the next chunk.
+    """
+
+    def __init__(self):
+        self.mul_enabled = True
+        self.part1 = 0
+        self.part2 = 0
+        self._carry = b""
+
+    def feed(self, chunk: bytes) -> None:
+        buffer = self._carry + chunk
+        totals = run_instructions(buffer, mul_enabled=self.mul_enabled)
+        self.part1 += totals.part1
+        self.part2 += totals.part2
+        self.mul_enabled = totals.mul_enabled
+        partial = _PARTIAL_INSTRUCTION_BYTES.search(buffer, totals.scanned_to)
+        self._carry = buffer[partial.start():] if partial else b""
+
+    def scan_file(self, file_path: str, chunk_size: int = 1 << 20) -> None:
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(chunk_size):
+                self.feed(chunk)
+
+
+def scan_segment(buffer, start: int = 0, end: int = None) -> tuple:
+    """ Summarise buffer[start:end] independently of what precedes it
+
+    Returns (part1, sum_if_enabled, sum_if_disabled, final_state) where the
+    two sums assume the segment starts with mul enabled or disabled, and
+    final_state is None when the segment contains no do()/don't().
+    """
+    end = len(buffer) if end is None else end
+    # Only the muls before the first do()/don't() depend on the start state
+    switch = _SWITCH_BYTES.search(buffer, start, end)
+    if switch is None:
+        totals = run_instructions(buffer, start, end)
+        return totals.part1, totals.part1, 0, None
+    head = run_instructions(buffer, start, switch.start())
+    tail = run_instructions(buffer, switch.start(), end)
+    return (head.part1 + tail.part1, head.part1 + tail.part2, tail.part2,
+            tail.mul_enabled)
+
+
+def combine_segments(first: tuple, second: tuple) -> tuple:
+    """ Associatively combine the summaries of two adjacent segments """
+    part1_a, enabled_a, disabled_a, final_a = first
+    part1_b, enabled_b, disabled_b, final_b = second
+
+    def continue_from(state):
+        return enabled_b if state else disabled_b
+
+    return (part1_a + part1_b,
+            enabled_a + continue_from(True if final_a is None else final_a),
+            disabled_a + continue_from(False if final_a is None else final_a),
+            final_a if final_b is None else final_b)
+
+
+def _safe_offset(buffer, offset: int) -> int:
+    # 'm' and 'd' only ever start an instruction, so splitting right before
+    # one never cuts an instruction in two
+    candidates = [pos for pos in (buffer.find(b"m", offset),
+                                  buffer.find(b"d", offset)) if pos != -1]
+    return min(candidates, default=len(buffer))
+
+
+def _scan_file_segment(task: tuple) -> tuple:
+    file_path, start, end = task
+    with open(file_path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return scan_segment(data, start, end)
+
+
+def compute_parallel(file_path: str, workers: int = None,
+                     segments: int = None) -> tuple:
+    """ Both parts for a large dump, scanning segments in a process pool """
+    workers = workers or os.cpu_count() or 1
+    segments = segments or workers * 4
+    if os.path.getsize(file_path) == 0:
+        return 0, 0
+    with open(file_path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        step = max(1, len(data) // segments)
+        bounds = [0]
+        while bounds[-1] < len(data):
+            bounds.append(_safe_offset(data, bounds[-1] + step))
+    tasks = [(file_path, start, end) for start, end in zip(bounds, bounds[1:])]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = list(executor.map(_scan_file_segment, tasks))
+    part1, sum_if_enabled, _, _ = reduce(combine_segments, summaries,
+                                         (0, 0, 0, None))
+    return part1, sum_if_enabled
+
+
 class TestCalculations(unittest.TestCase):
 
     def test_part1(self):
@@ -55,11 +185,55 @@ class TestCalculations(unittest.TestCase):
         test_content = "xmul(2,4)&mul[3,7]!^don't()_mul(5,5)+mul(32,64](mul(11,8)undo()?mul(8,5))"
         self.assertEqual(compute_with_do_and_dont(test_content), 48)
 
+    def test_run_instructions(self):
+        test_content = (b"xmul(2,4)&mul[3,7]!^don't()_mul(5,5)+mul(32,64](mul"
+                        b"(11,8)undo()?mul(8,5))")
+        totals = run_instructions(memoryview(test_content))
+        self.assertEqual(totals.part1, 161)
+        self.assertEqual(totals.part2, 48)
+        self.assertEqual(totals.counts, {"mul": 4, "do": 1, "dont": 1})
+        self.assertTrue(totals.mul_enabled)
+        self.assertEqual(totals.scanned_to, len(test_content) - 1)
+
+    def test_scanner_chunk_boundaries(self):
+        test_content = ("xmul(2,4)&mul[3,7]!^don't()_mul(5,5)+mul(32,64](mul"
+                        "(11,8)undo()?mul(8,5))mul(1,mul(123,45)do(don't(")
+        data = test_content.encode()
+        for chunk_size in range(1, len(data) + 1):
+            scanner = InstructionScanner()
+            for start in range(0, len(data), chunk_size):
+                scanner.feed(data[start:start + chunk_size])
+            self.assertEqual(scanner.part1, extract_and_compute(test_content))
+            self.assertEqual(scanner.part2,
+                             compute_with_do_and_dont(test_content))
+
+    def test_segment_summaries_combine(self):
+        data = (b"xmul(2,4)&mul[3,7]!^don't()_mul(5,5)+mul(32,64](mul(11,8)"
+                b"undo()?mul(8,5))mul(3,3)don't()mul(2,2)do()")
+        whole = scan_segment(data)
+        for split in range(len(data) + 1):
+            split = _safe_offset(data, split)
+            combined = combine_segments(scan_segment(data, 0, split),
+                                        scan_segment(data, split))
+            self.assertEqual(combined, whole)
+
+    def test_compute_parallel(self):
+        test_content = ("xmul(2,4)&mul[3,7]!^don't()_mul(5,5)+mul(32,64](mul"
+                        "(11,8)undo()?mul(8,5))") * 50
+        with tempfile.NamedTemporaryFile('w', delete=False) as file:
+            file.write(test_content)
+        try:
+            result = compute_parallel(file.name, workers=2, segments=7)
+        finally:
+            os.remove(file.name)
+        self.assertEqual(result, (extract_and_compute(test_content),
+                                  compute_with_do_and_dont(test_content)))
+
 
 if __name__ == "__main__":
     file_path = 'input3.txt'
 
-    with open('./input3.txt', 'r') as file:
-        content = file.read()
-        print(extract_and_compute(content))
-        print(compute_with_do_and_dont(content))
+    with open(file_path, 'rb') as file:
+        totals = run_instructions(file.read())
+        print(totals.part1)
+        print(totals.part2)
@@ -1,6 +1,20 @@
-from typing import List, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple, Union
+import os
+import random
+import tempfile
 import unittest
 
+from grid import Grid
+
+DIRECTIONS: List[Tuple[int, int]] = [
+    (-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)
+]
+
+GridLike = Union[List[List[str]], Grid]
+
 def count_word_occurrences(grid: List[List[str]], word: str) -> int:
     """
     Counts the number of occurrences of a word in a grid, considering all 8 possible directions.
@@ -50,56 +64,359 @@ def count_word_occurrences(grid: List[List[str]], word: str) -> int:
 
     return count
 
-def count_xmas_shapes(grid: List[List[str]]) -> int:
+def letter_masks(data: bytes, letters: Iterable[str]) -> Dict[str, int]:
+    """
+    Builds one mask per letter: an integer with byte i set to 1 where data[i] is the letter.
+
+    Shifting a mask by whole bytes moves it across the grid, and AND-ing masks combines
+    letter constraints for every cell at once.
+
+    Args:
+        data: The grid bytes, laid out like Grid.data.
+        letters: The letters to build masks for.
+
+    Returns:
+        A dictionary mapping each letter to its mask.
+    """
+    masks = {}
+    for letter in set(letters):
+        table = bytearray(256)
+        table[ord(letter)] = 1
+        masks[letter] = int.from_bytes(data.translate(table), 'little')
+    return masks
+
+def shift_mask(mask: int, offset: int) -> int:
+    """Moves the cell at position p + offset of a mask to position p."""
+    return mask >> (offset * 8) if offset >= 0 else mask << (-offset * 8)
+
+def word_match_mask(masks: Dict[str, int], stride: int, word: str, dx: int, dy: int) -> int:
+    """Mask of the start cells from which the word reads in direction (dx, dy)."""
+    offset = dx * stride + dy
+    matches = masks[word[0]]
+    for k in range(1, len(word)):
+        if not matches:
+            break
+        matches &= shift_mask(masks[word[k]], k * offset)
+    return matches
+
+def count_word_occurrences_vectorized(grid: GridLike, word: str) -> int:
+    """
+    Counts the occurrences of a word in all 8 directions using shifted letter masks.
+
+    Gives the same counts as count_word_occurrences, but every cell is tested at once by
+    big-integer AND operations instead of interpreter loops.
+
+    Args:
+        grid: A 2D list of single-character strings representing the grid, or a Grid.
+        word: The word to search for.
+
+    Returns:
+        The number of times the word occurs in the grid.
+    """
+    grid = Grid.coerce(grid)
+    if not word or not grid.rows:
+        return 0
+    masks = letter_masks(grid.data, word)
+    return sum(word_match_mask(masks, grid.stride, word, dx, dy).bit_count()
+               for dx, dy in DIRECTIONS)
+
+def build_automaton(patterns: List[bytes]) -> Tuple[List[int], List[List[int]]]:
+    """
+    Builds an Aho-Corasick automaton as a full transition table over byte values.
+
+    Args:
+        patterns: The non-empty byte strings to recognise.
+
+    Returns:
+        A tuple of the transition table and, per state, the indices of the patterns that
+        end there (including those reached through failure links). Table entries are
+        state numbers multiplied by 256, so the next state is table[state + byte].
+    """
+    goto: List[Dict[int, int]] = [{}]
+    outputs: List[List[int]] = [[]]
+    for index, pattern in enumerate(patterns):
+        state = 0
+        for byte in pattern:
+            if byte not in goto[state]:
+                goto.append({})
+                outputs.append([])
+                goto[state][byte] = len(goto) - 1
+            state = goto[state][byte]
+        outputs[state].append(index)
+
+    table = [0] * (len(goto) * 256)
+    fail = [0] * len(goto)
+    queue = deque()
+    for byte, child in goto[0].items():
+        table[byte] = child * 256
+        queue.append(child)
+    while queue:
+        state = queue.popleft()
+        outputs[state] = outputs[state] + outputs[fail[state]]
+        base = state * 256
+        fallback = fail[state] * 256
+        table[base:base + 256] = table[fallback:fallback + 256]
+        for byte, child in goto[state].items():
+            fail[child] = table[fallback + byte] // 256
+            table[base + byte] = child * 256
+            queue.append(child)
+    return table, outputs
+
+def grid_lines(grid: Grid) -> List[memoryview]:
+    """Returns zero-copy views of the rows, columns, diagonals and anti-diagonals of the grid."""
+    lines = [grid.row(r) for r in range(grid.rows)]
+    lines.extend(grid.column(c) for c in range(grid.cols))
+    lines.extend(grid.line(0, c, 1, 1) for c in range(grid.cols))
+    lines.extend(grid.line(r, 0, 1, 1) for r in range(1, grid.rows))
+    lines.extend(grid.line(0, c, 1, -1) for c in range(grid.cols))
+    lines.extend(grid.line(r, grid.cols - 1, 1, -1) for r in range(1, grid.rows))
+    return lines
+
+def count_words(grid: GridLike, words: Iterable[str]) -> Dict[str, int]:
+    """
+    Counts every word of a dictionary in all 8 directions in a single pass over the grid.
+
+    Each word and its reverse are loaded into one Aho-Corasick automaton, and every row,
+    column, diagonal and anti-diagonal is streamed through it once. The counts equal
+    count_word_occurrences for each word.
+
+    Args:
+        grid: A 2D list of single-character strings representing the grid, or a Grid.
+        words: The words to search for.
+
+    Returns:
+        A dictionary mapping each word to its number of occurrences.
+    """
+    grid = Grid.coerce(grid)
+    counts = {word: 0 for word in words}
+    searched = [word for word in counts if word]
+    if not searched or not grid.rows:
+        return counts
+    patterns = []
+    for word in searched:
+        patterns.append(word.encode('latin-1'))
+        patterns.append(word[::-1].encode('latin-1'))
+    table, outputs = build_automaton(patterns)
+
+    hits = [0] * len(outputs)
+    for line in grid_lines(grid):
+        state = 0
+        for byte in line:
+            state = table[state + byte]
+            hits[state >> 8] += 1
+
+    for state, state_hits in enumerate(hits):
+        if state_hits:
+            for index in outputs[state]:
+                counts[searched[index // 2]] += state_hits
+    return counts
+
+Constraint = Tuple[int, int, str]
+StencilVariant = Tuple[int, int, Tuple[Constraint, ...]]
+
+def compile_pattern(stencil: List[str], wildcard: str = '.', rotations: bool = False,
+                    reflections: bool = False) -> List[StencilVariant]:
+    """
+    Compiles a 2D stencil into offset/letter constraints.
+
+    Args:
+        stencil: The rows of the stencil; the wildcard character matches any cell.
+        wildcard: The character that places no constraint on its cell.
+        rotations: Also match the stencil rotated by 90, 180 and 270 degrees.
+        reflections: Also match the mirror images of the stencil.
+
+    Returns:
+        The distinct variants, each as (height, width, constraints) where a constraint
+        (dr, dc, letter) requires the letter at that offset from the top-left corner.
+    """
+    width = max(map(len, stencil), default=0)
+    shapes = [tuple(row.ljust(width, wildcard) for row in stencil)]
+    if reflections:
+        shapes.append(tuple(row[::-1] for row in shapes[0]))
+    if rotations:
+        for shape in list(shapes):
+            for _ in range(3):
+                shape = tuple("".join(column) for column in zip(*reversed(shape)))
+                shapes.append(shape)
+
+    variants = []
+    for shape in dict.fromkeys(shapes):
+        constraints = tuple((dr, dc, letter)
+                            for dr, row in enumerate(shape)
+                            for dc, letter in enumerate(row)
+                            if letter != wildcard)
+        variants.append((len(shape), len(shape[0]) if shape else 0, constraints))
+    return variants
+
+def anchor_mask(grid: Grid, height: int, width: int) -> int:
+    """Mask of the top-left cells at which a height x width box fits inside the grid."""
+    fits_rows = grid.rows - height + 1
+    fits_cols = grid.cols - width + 1
+    if fits_rows <= 0 or fits_cols <= 0:
+        return 0
+    row = b"\x01" * fits_cols + b"\x00" * (grid.stride - fits_cols)
+    return int.from_bytes(row * fits_rows, 'little') << (grid.index(0, 0) * 8)
+
+def pattern_match_masks(grid: Grid, pattern: List[StencilVariant]) -> List[int]:
+    """Masks of the anchors at which each variant of the pattern matches."""
+    masks = letter_masks(grid.data, (letter for _, _, constraints in pattern
+                                     for _, _, letter in constraints))
+    variant_matches = []
+    for height, width, constraints in pattern:
+        matches = anchor_mask(grid, height, width)
+        for dr, dc, letter in constraints:
+            if not matches:
+                break
+            matches &= shift_mask(masks[letter], dr * grid.stride + dc)
+        variant_matches.append(matches)
+    return variant_matches
+
+def count_pattern(grid: GridLike, pattern: List[StencilVariant]) -> int:
+    """
+    Counts the placements of a compiled stencil pattern in the grid.
+
+    Every variant is checked at all anchors at once by AND-ing shifted letter masks.
+
+    Args:
+        grid: A 2D list of single-character strings representing the grid, or a Grid.
+        pattern: The variants returned by compile_pattern.
+
+    Returns:
+        The number of placements, summed over all variants.
+    """
+    grid = Grid.coerce(grid)
+    return sum(matches.bit_count() for matches in pattern_match_masks(grid, pattern))
+
+XMAS_PATTERN = compile_pattern(["M.S",
+                                ".A.",
+                                "M.S"], rotations=True)
+
+def count_xmas_shapes(grid: GridLike) -> int:
     """
     Counts the number of 'X-MAS' shapes in the grid. An 'X-MAS' shape consists of two overlapping
     'MAS' sequences forming an 'X', where each 'MAS' can be forwards or backwards.
 
+    Ragged rows are padded to the longest row (see Grid.from_lines) rather than cut to the
+    width of the first row, so shapes reaching past a short first row are counted.
+
     Args:
-        grid: A 2D list of single-character strings representing the grid.
+        grid: A 2D list of single-character strings representing the grid, or a Grid.
 
     Returns:
         The number of 'X-MAS' shapes found in the grid.
     """
-    rows = len(grid)
-    cols = len(grid[0]) if rows > 0 else 0
+    return count_pattern(grid, XMAS_PATTERN)
 
-    def is_valid_position(x: int, y: int) -> bool:
-        return 0 <= x < rows and 0 <= y < cols
+def read_bands(file_path: str, band_rows: int, above: int,
+               below: int) -> Iterable[Tuple[List[str], int, int]]:
+    """
+    Reads a grid file in bands of rows, each with a halo of neighbouring rows.
+
+    Args:
+        file_path: The grid file, one row per line.
+        band_rows: The number of rows owned by each band.
+        above: The number of halo rows to include above each band.
+        below: The number of halo rows to include below each band.
 
-    def check_diagonal(seq: List[str]) -> bool:
-        return seq == ['M', 'A', 'S'] or seq == ['S', 'A', 'M']
+    Yields:
+        Tuples of (rows, first_owned, owned): the band rows including its halo, the
+        index of the first owned row within them and the number of owned rows.
+    """
+    with open(file_path, 'r') as file:
+        lines = (line.strip() for line in file if line.strip())
+        previous: List[str] = []
+        pending = list(islice(lines, band_rows + below))
+        while pending:
+            owned = min(band_rows, len(pending))
+            yield previous + pending, len(previous), owned
+            previous = (previous + pending[:owned])[-above:] if above else []
+            pending = pending[owned:] + list(islice(lines, owned))
 
-    count = 0
-    for i in range(1, rows - 1):
-        for j in range(1, cols - 1):
-            center = grid[i][j]
-            if center != 'A':
-                continue
-
-            # Check down-right diagonal
-            dr_seq = []
-            for k in range(-1, 2):
-                x, y = i + k, j + k
-                if not is_valid_position(x, y):
-                    break
-                dr_seq.append(grid[x][y])
-            else:
-                if not check_diagonal(dr_seq):
-                    continue
-            # Check down-left diagonal
-            dl_seq = []
-            for k in range(-1, 2):
-                x, y = i + k, j - k
-                if not is_valid_position(x, y):
-                    break
-                dl_seq.append(grid[x][y])
-            else:
-                if not check_diagonal(dl_seq):
-                    continue
-            # Both diagonals form 'MAS' or 'SAM'
-            count += 1
-    return count
+def _owned_matches(matches: int, grid: Grid, first_owned: int, owned: int) -> int:
+    """Counts the matches whose start cell lies in the owned rows of a band."""
+    matches >>= grid.index(first_owned, 0) * 8
+    return (matches & ((1 << (owned * grid.stride * 8)) - 1)).bit_count()
+
+def _count_word_band(rows: List[str], first_owned: int, owned: int, word: str) -> int:
+    grid = Grid.from_lines(rows)
+    masks = letter_masks(grid.data, word)
+    return sum(_owned_matches(word_match_mask(masks, grid.stride, word, dx, dy),
+                              grid, first_owned, owned)
+               for dx, dy in DIRECTIONS)
+
+def _count_pattern_band(rows: List[str], first_owned: int, owned: int,
+                        pattern: List[StencilVariant]) -> int:
+    grid = Grid.from_lines(rows)
+    return sum(_owned_matches(matches, grid, first_owned, owned)
+               for matches in pattern_match_masks(grid, pattern))
+
+def _count_bands(count_band, bands, argument, workers: int) -> int:
+    """Sums count_band over the bands, keeping at most 2 * workers bands in flight."""
+    if workers <= 1:
+        return sum(count_band(rows, first_owned, owned, argument)
+                   for rows, first_owned, owned in bands)
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for rows, first_owned, owned in bands:
+            in_flight.append(executor.submit(count_band, rows, first_owned, owned, argument))
+            if len(in_flight) >= 2 * workers:
+                total += in_flight.popleft().result()
+        total += sum(future.result() for future in in_flight)
+    return total
+
+def count_word_occurrences_tiled(file_path: str, word: str, band_rows: int = 1024,
+                                 workers: int = 1) -> int:
+    """
+    Counts the occurrences of a word in a grid file without loading the whole grid.
+
+    The grid is read in bands with a halo of len(word) - 1 rows on both sides; a match
+    is counted by the band owning its start row, so the total is exact.
+
+    Args:
+        file_path: The grid file, one row per line.
+        word: The word to search for.
+        band_rows: The number of rows owned by each band.
+        workers: The number of processes counting bands in parallel.
+
+    Returns:
+        The number of times the word occurs in the grid.
+    """
+    if not word:
+        return 0
+    halo = len(word) - 1
+    bands = read_bands(file_path, band_rows, halo, halo)
+    return _count_bands(_count_word_band, bands, word, workers)
+
+def count_pattern_tiled(file_path: str, pattern: List[StencilVariant], band_rows: int = 1024,
+                        workers: int = 1) -> int:
+    """
+    Counts the placements of a compiled stencil pattern in a grid file, band by band.
+
+    Placements are anchored at their top-left cell, so bands only need a halo of the
+    tallest variant's height minus one rows below them.
+
+    Args:
+        file_path: The grid file, one row per line.
+        pattern: The variants returned by compile_pattern.
+        band_rows: The number of rows owned by each band.
+        workers: The number of processes counting bands in parallel.
+
+    Returns:
+        The number of placements, summed over all variants.
+    """
+    halo = max((height for height, _, _ in pattern), default=1) - 1
+    bands = read_bands(file_path, band_rows, 0, halo)
+    return _count_bands(_count_pattern_band, bands, pattern, workers)
+
+def _random_grids(seed: int, count: int = 20, max_size: int = 10) -> List[List[List[str]]]:
+    """Random XMAS grids of 1 to max_size rows and columns, seeded for repeatable tests."""
+    rng = random.Random(seed)
+    grids = []
+    for _ in range(count):
+        rows, cols = rng.randint(1, max_size), rng.randint(1, max_size)
+        grids.append([[rng.choice("XMAS") for _ in range(cols)] for _ in range(rows)])
+    return grids
 
 class TestCountWordOccurrences(unittest.TestCase):
     """Unit tests for count_word_occurrences function."""
@@ -161,6 +478,62 @@ class TestCountWordOccurrences(unittest.TestCase):
         expected_count = 11
         self.assertEqual(result, expected_count)
 
+class TestCountWordOccurrencesVectorized(unittest.TestCase):
+    """Unit tests for count_word_occurrences_vectorized function."""
+
+    def test_matches_reference(self):
+        """Test that the vectorized counts equal the loop-based counts."""
+        grids = [[], [['X']], [['X', 'M', 'A', 'S']]] + _random_grids(4, max_size=12)
+        for grid in grids:
+            for word in ("XMAS", "X", "SAS", "MM"):
+                self.assertEqual(count_word_occurrences_vectorized(grid, word),
+                                 count_word_occurrences(grid, word))
+                self.assertEqual(count_word_occurrences_vectorized(Grid.from_lines(grid), word),
+                                 count_word_occurrences(grid, word))
+
+class TestCountWords(unittest.TestCase):
+    """Unit tests for count_words function."""
+
+    def test_empty_grid(self):
+        """Test with an empty grid."""
+        self.assertEqual(count_words([], ["XMAS"]), {"XMAS": 0})
+
+    def test_matches_reference(self):
+        """Test that every dictionary word gets the loop-based count."""
+        words = ["XMAS", "X", "SAS", "MAM", "AS", "SA", "", "XMASX"]
+        for grid in _random_grids(10):
+            expected = {word: count_word_occurrences(grid, word) for word in words}
+            self.assertEqual(count_words(grid, words), expected)
+
+class TestTiledCounts(unittest.TestCase):
+    """Unit tests for the tiled, out-of-core counts."""
+
+    def setUp(self):
+        rng = random.Random(12)
+        self.grid = [[rng.choice("XMAS") for _ in range(15)] for _ in range(23)]
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+            file.write("\n".join("".join(row) for row in self.grid) + "\n")
+        self.file_path = file.name
+        self.addCleanup(os.remove, file.name)
+
+    def test_word_bands(self):
+        """Test that every band size gives the in-memory count."""
+        expected = count_word_occurrences_vectorized(self.grid, "XMAS")
+        for band_rows in (1, 2, 3, 5, 23, 100):
+            self.assertEqual(count_word_occurrences_tiled(self.file_path, "XMAS", band_rows),
+                             expected)
+        self.assertEqual(count_word_occurrences_tiled(self.file_path, "XMAS", 4, workers=2),
+                         expected)
+
+    def test_pattern_bands(self):
+        """Test that every band size gives the in-memory X-MAS count."""
+        expected = count_xmas_shapes(self.grid)
+        for band_rows in (1, 2, 7, 100):
+            self.assertEqual(count_pattern_tiled(self.file_path, XMAS_PATTERN, band_rows),
+                             expected)
+        self.assertEqual(count_pattern_tiled(self.file_path, XMAS_PATTERN, 3, workers=2),
+                         expected)
+
 class TestCountXmasShapes(unittest.TestCase):
     """Unit tests for count_xmas_shapes function."""
 
@@ -220,6 +593,34 @@ class TestCountXmasShapes(unittest.TestCase):
         result = count_xmas_shapes(grid)
         self.assertEqual(result, 9)
 
+    def test_word_search_example(self):
+        """Test with the word search example, which has 9 X-MAS shapes."""
+        grid_str = """
+        MMMSXXMASM
+        MSAMXMSMSA
+        AMXSXMAAMM
+        MSAMASMSMX
+        XMASAMXAMM
+        XXAMMXXAMA
+        SMSMSASXSS
+        SAXAMASAAA
+        MAMMMXMMMM
+        MXMXAXMASX
+        """
+        grid = [list(line.strip()) for line in grid_str.strip().split('\n')]
+        self.assertEqual(len(XMAS_PATTERN), 4)
+        self.assertEqual(count_xmas_shapes(grid), 9)
+
+    def test_general_stencils(self):
+        """Test that straight and diagonal stencils add up to the word search count."""
+        straight = compile_pattern(["XMAS"], rotations=True, reflections=True)
+        diagonal = compile_pattern(["X...", ".M..", "..A.", "...S"],
+                                   rotations=True, reflections=True)
+        self.assertEqual((len(straight), len(diagonal)), (4, 4))
+        for grid in _random_grids(11):
+            self.assertEqual(count_pattern(grid, straight) + count_pattern(grid, diagonal),
+                             count_word_occurrences(grid, "XMAS"))
+
     def test_puzzle_input(self):
         """Test with the puzzle input for Part Two."""
         with open('input4.txt', 'r') as file:
@@ -233,12 +634,11 @@ if __name__ == '__main__':
 
     # Load input from 'input4.txt' if running as main
     if len(sys.argv) > 1 and sys.argv[1] == 'run':
-        with open('input4.txt', 'r') as file:
-            grid = [list(line.strip()) for line in file if line.strip()]
+        grid = Grid.from_file('input4.txt')
         word = "XMAS"
         part = sys.argv[2] if len(sys.argv) > 2 else 'part1'
         if part == 'part1':
-            result = count_word_occurrences(grid, word)
+            result = count_word_occurrences_vectorized(grid, word)
             print(f"Part One - Number of occurrences of '{word}': {result}")
         elif part == 'part2':
             result = count_xmas_shapes(grid)
@@ -1,6 +1,12 @@
-from typing import List, Dict, Set, Tuple
+from array import array
+import hashlib
+import os
+import random
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 import unittest
 
+SNAPSHOT_MAGIC = b"AOC5RUL1"
+
 def parse_input(input_str: str) -> Tuple[List[Tuple[int, int]], List[List[int]]]:
     """
     Parses the input string into ordering rules and updates.
@@ -30,17 +36,326 @@ def parse_input(input_str: str) -> Tuple[List[Tuple[int, int]], List[List[int]]]
 
     return ordering_rules, updates
 
-def is_update_correct(ordering_rules: List[Tuple[int, int]], update: List[int]) -> bool:
+def split_sections(input_str: str) -> Tuple[str, str]:
     """
-    Checks if an update is correctly ordered according to the given ordering rules.
+    Splits the raw input at the first blank line, without parsing either section.
 
     Args:
+        input_str: The raw input string containing ordering rules and updates.
+
+    Returns:
+        A tuple of the rules section and the updates section.
+    """
+    lines = [line.strip() for line in input_str.strip().split('\n')]
+    if '' not in lines:
+        return '\n'.join(lines), ''
+    blank = lines.index('')
+    return '\n'.join(lines[:blank]), '\n'.join(lines[blank + 1:])
+
+def parse_updates(updates_str: str) -> List[List[int]]:
+    """
+    Parses the updates section of the input.
+
+    Args:
+        updates_str: The updates section, one comma-separated update per line.
+
+    Returns:
+        A list of updates, each update is a list of page numbers.
+    """
+    return [list(map(int, line.split(','))) for line in updates_str.split('\n') if line.strip()]
+
+def rules_digest(rules_str: str) -> bytes:
+    """Returns the SHA-256 of the rules section, ignoring surrounding whitespace."""
+    lines = (line.strip() for line in rules_str.strip().split('\n'))
+    return hashlib.sha256('\n'.join(lines).encode()).digest()
+
+def write_rules_snapshot(snapshot_path: str, rules_str: str,
+                         ordering_rules: List[Tuple[int, int]]) -> None:
+    """
+    Writes parsed rules to a compact binary snapshot.
+
+    The layout is the magic bytes, the SHA-256 of the rules text and then the rules as
+    flat native int64 pairs. The file is written next to its destination and renamed, so
+    readers never see a partial snapshot.
+
+    Args:
+        snapshot_path: The snapshot file to write.
+        rules_str: The rules section the rules were parsed from.
         ordering_rules: A list of tuples representing the ordering rules.
+    """
+    pairs = array('q', [page for rule in ordering_rules for page in rule])
+    temporary_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        file.write(rules_digest(rules_str))
+        pairs.tofile(file)
+    os.replace(temporary_path, snapshot_path)
+
+def read_rules_snapshot(snapshot_path: str, rules_str: str) -> Optional[List[Tuple[int, int]]]:
+    """
+    Reads rules from a snapshot if it exists and was compiled from the same rules text.
+
+    Args:
+        snapshot_path: The snapshot file to read.
+        rules_str: The current rules section.
+
+    Returns:
+        The ordering rules, or None if the snapshot is missing, malformed or stale.
+    """
+    try:
+        with open(snapshot_path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    header_size = len(SNAPSHOT_MAGIC) + hashlib.sha256().digest_size
+    pairs = array('q')
+    if (not data.startswith(SNAPSHOT_MAGIC)
+            or (len(data) - header_size) % (2 * pairs.itemsize)
+            or data[len(SNAPSHOT_MAGIC):header_size] != rules_digest(rules_str)):
+        return None
+    pairs.frombytes(data[header_size:])
+    return list(zip(pairs[0::2], pairs[1::2]))
+
+def load_rules(rules_str: str, snapshot_path: str) -> List[Tuple[int, int]]:
+    """
+    Loads the ordering rules from their snapshot, rebuilding it when the rules changed.
+
+    Args:
+        rules_str: The rules section of the input.
+        snapshot_path: The snapshot file caching the parsed rules.
+
+    Returns:
+        A list of tuples representing the ordering rules.
+    """
+    ordering_rules = read_rules_snapshot(snapshot_path, rules_str)
+    if ordering_rules is None:
+        ordering_rules, _ = parse_input(rules_str)
+        write_rules_snapshot(snapshot_path, rules_str, ordering_rules)
+    return ordering_rules
+
+class RuleIndex:
+    """
+    Ordering rules indexed by page: a hashed set of successors for every page.
+
+    Built once from parse_input output, it answers update validation in time depending on
+    the update length instead of the number of rules.
+    """
+
+    def __init__(self, ordering_rules: List[Tuple[int, int]]):
+        self.ordering_rules = list(ordering_rules)
+        self.successors: Dict[int, Set[int]] = {}
+        for x, y in ordering_rules:
+            self.successors.setdefault(x, set()).add(y)
+
+    def must_precede(self, x: int, y: int) -> bool:
+        """Returns True if a rule requires page x to be printed before page y."""
+        return y in self.successors.get(x, ())
+
+    def is_update_correct(self, update: List[int]) -> bool:
+        """
+        Checks if an update is correctly ordered.
+
+        Every page is checked against the set of pages seen up to and including it.
+        Checking only adjacent pairs would not be exact when the rules do not order every
+        pair of pages in the update. Each check costs O(min(|successors|, |seen|)), so an
+        update of k pages takes O(k^2) in the worst case, independent of the rule count.
+
+        A repeated page is taken at its last occurrence and a rule x|x rejects any update
+        containing x, which is how the rule-list path compares page positions.
+
+        Args:
+            update: A list of page numbers representing the update.
+
+        Returns:
+            True if the update is correctly ordered, False otherwise.
+        """
+        # Distinct pages ordered by their last occurrence
+        pages = list(dict.fromkeys(reversed(update)))
+        pages.reverse()
+        seen: Set[int] = set()
+        for page in pages:
+            seen.add(page)
+            successors = self.successors.get(page)
+            if successors and not successors.isdisjoint(seen):
+                return False
+        return True
+
+Rules = Union[List[Tuple[int, int]], RuleIndex]
+
+def as_rule_index(ordering_rules: Rules) -> RuleIndex:
+    """Returns the rules as a RuleIndex, building one if given a list of rules."""
+    if isinstance(ordering_rules, RuleIndex):
+        return ordering_rules
+    return RuleIndex(ordering_rules)
+
+def strongly_connected_components(successors: Dict[int, Set[int]],
+                                  pages: Iterable[int]) -> List[List[int]]:
+    """
+    Finds the strongly connected components of the rule graph restricted to the given pages.
+
+    Args:
+        successors: The successor sets of a RuleIndex.
+        pages: The pages spanning the subgraph to consider.
+
+    Returns:
+        The components in reverse topological order: every component comes after all
+        components reachable from it.
+    """
+    pages = set(pages)
+    order: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    stack: List[int] = []
+    on_stack: Set[int] = set()
+    components: List[List[int]] = []
+    for root in pages:
+        if root in order:
+            continue
+        order[root] = low[root] = len(order)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            page, neighbours = work[-1]
+            for neighbour in neighbours:
+                if neighbour not in pages:
+                    continue
+                if neighbour not in order:
+                    order[neighbour] = low[neighbour] = len(order)
+                    stack.append(neighbour)
+                    on_stack.add(neighbour)
+                    work.append((neighbour, iter(successors.get(neighbour, ()))))
+                    break
+                if neighbour in on_stack:
+                    low[page] = min(low[page], order[neighbour])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[page])
+                if low[page] == order[page]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == page:
+                            break
+                    components.append(component)
+    return components
+
+class PrecedenceClosure:
+    """
+    Transitive closure of the ordering rules as one bitset (a Python int) per page.
+
+    Bit i of a page's bitset is set when the page must, directly or through a chain of
+    rules, come before the page numbered i, which makes every precedence query a single
+    bit test. The closure is only materialised by build(), after estimate_bytes() has
+    reported its size. It keeps its own copy of the index, so add_rule() leaves the
+    caller's index and rule list untouched.
+    """
+
+    def __init__(self, index: RuleIndex):
+        self.index = index = RuleIndex(index.ordering_rules)
+        pages = set(index.successors)
+        for successors in index.successors.values():
+            pages |= successors
+        self.bit_of: Dict[int, int] = {page: bit for bit, page in enumerate(sorted(pages))}
+        self.reach: Optional[Dict[int, int]] = None
+
+    def estimate_bytes(self) -> int:
+        """Estimates the memory of the materialised closure: one n-bit int per page."""
+        pages = len(self.bit_of)
+        return pages * ((pages + 7) // 8 + 100)
+
+    def build(self, max_bytes: Optional[int] = None) -> 'PrecedenceClosure':
+        """
+        Materialises the closure, one strongly connected component at a time.
+
+        Components are finished in reverse topological order, so each one is the union of
+        the already finished closures of its successors.
+
+        Args:
+            max_bytes: Refuse to build if estimate_bytes() exceeds this.
+
+        Returns:
+            The closure itself, for chaining.
+        """
+        estimate = self.estimate_bytes()
+        if max_bytes is not None and estimate > max_bytes:
+            raise MemoryError(f"Closure needs about {estimate} bytes, limit is {max_bytes}.")
+        successors = self.index.successors
+        reach: Dict[int, int] = {}
+        for component in strongly_connected_components(successors, self.bit_of):
+            members = 0
+            for page in component:
+                members |= 1 << self.bit_of[page]
+            closure = 0
+            for page in component:
+                for successor in successors.get(page, ()):
+                    if successor in reach:
+                        closure |= reach[successor] | (1 << self.bit_of[successor])
+                    else:
+                        # Successor inside this component: the component is a cycle
+                        closure |= members
+            for page in component:
+                reach[page] = closure
+        self.reach = reach
+        return self
+
+    def must_precede(self, x: int, y: int) -> bool:
+        """Returns True if the rules force page x before page y, directly or transitively."""
+        if self.reach is None:
+            self.build()
+        bit = self.bit_of.get(y)
+        return bit is not None and x in self.reach and bool(self.reach[x] >> bit & 1)
+
+    def find_cycles(self, pages: Optional[Iterable[int]] = None) -> List[List[int]]:
+        """
+        Finds the cycles that correct_update_order would run into.
+
+        Args:
+            pages: Only consider rules between these pages (e.g. one update); all pages
+                when omitted.
+
+        Returns:
+            The groups of pages that must each precede one another.
+        """
+        successors = self.index.successors
+        return [component
+                for component in strongly_connected_components(
+                    successors, self.bit_of if pages is None else pages)
+                if len(component) > 1 or component[0] in successors.get(component[0], ())]
+
+    def add_rule(self, x: int, y: int) -> None:
+        """Adds the rule x|y, updating a materialised closure in place."""
+        self.index.ordering_rules.append((x, y))
+        self.index.successors.setdefault(x, set()).add(y)
+        for page in (x, y):
+            if page not in self.bit_of:
+                self.bit_of[page] = len(self.bit_of)
+                if self.reach is not None:
+                    self.reach[page] = 0
+        if self.reach is None:
+            return
+        added = self.reach[y] | (1 << self.bit_of[y])
+        x_bit = self.bit_of[x]
+        for page, closure in self.reach.items():
+            if page == x or closure >> x_bit & 1:
+                self.reach[page] = closure | added
+
+def is_update_correct(ordering_rules: Rules, update: List[int]) -> bool:
+    """
+    Checks if an update is correctly ordered according to the given ordering rules.
+
+    Args:
+        ordering_rules: A list of tuples representing the ordering rules, or a RuleIndex.
         update: A list of page numbers representing the update.
 
     Returns:
         True if the update is correctly ordered, False otherwise.
     """
+    if isinstance(ordering_rules, RuleIndex):
+        return ordering_rules.is_update_correct(update)
     page_indices = {page: idx for idx, page in enumerate(update)}
     for x, y in ordering_rules:
         if x in page_indices and y in page_indices:
@@ -61,43 +376,45 @@ def find_middle_page(update: List[int]) -> int:
     middle_index = len(update) // 2
     return update[middle_index]
 
-def sum_of_middle_pages(ordering_rules: List[Tuple[int, int]], updates: List[List[int]]) -> int:
+def sum_of_middle_pages(ordering_rules: Rules, updates: List[List[int]]) -> int:
     """
     Calculates the sum of middle page numbers of correctly ordered updates.
 
     Args:
-        ordering_rules: A list of tuples representing the ordering rules.
+        ordering_rules: A list of tuples representing the ordering rules, or a RuleIndex.
         updates: A list of updates, each update is a list of page numbers.
 
     Returns:
         The sum of middle page numbers of correctly ordered updates.
     """
+    ordering_rules = as_rule_index(ordering_rules)
     total = 0
     for update in updates:
         if is_update_correct(ordering_rules, update):
             total += find_middle_page(update)
     return total
 
-def correct_update_order(ordering_rules: List[Tuple[int, int]], update: List[int]) -> List[int]:
+def correct_update_order(ordering_rules: Rules, update: List[int]) -> List[int]:
     """
     Corrects the order of an update according to the ordering rules.
 
     Args:
-        ordering_rules: A list of tuples representing the ordering rules.
+        ordering_rules: A list of tuples representing the ordering rules, or a RuleIndex.
         update: A list of page numbers representing the update.
 
     Returns:
         A list of page numbers in the correct order.
     """
-    # Build a graph of dependencies
-    graph: Dict[int, Set[int]] = {page: set() for page in update}
-    in_degree: Dict[int, int] = {page: 0 for page in update}
+    index = as_rule_index(ordering_rules)
 
-    # Only consider ordering rules that involve pages in the update
-    for x, y in ordering_rules:
-        if x in update and y in update:
-            graph[x].add(y)
-            in_degree[y] += 1
+    # Build a graph of dependencies, only from rules between pages in the update
+    pages = set(update)
+    graph: Dict[int, Set[int]] = {page: index.successors.get(page, set()) & pages
+                                  for page in update}
+    in_degree: Dict[int, int] = {page: 0 for page in update}
+    for successors in graph.values():
+        for page in successors:
+            in_degree[page] += 1
 
     # Kahn's algorithm for topological sorting
     from collections import deque
@@ -118,22 +435,52 @@ def correct_update_order(ordering_rules: List[Tuple[int, int]], update: List[int
 
     return sorted_update
 
-def sum_of_corrected_middle_pages(ordering_rules: List[Tuple[int, int]], updates: List[List[int]]) -> int:
+def find_corrected_middle_page(ordering_rules: Rules, update: List[int]) -> int:
+    """
+    Finds the middle page of an update after correction, without sorting the whole update.
+
+    Each page is ranked by how many pages of the update it must precede. When these counts
+    are exactly 0..k-1 and the ranking is a valid order, the rules order every pair of
+    pages, the corrected order is unique and the middle page is read off its count.
+    Otherwise the full correct_update_order is used, including its cycle detection.
+
+    Args:
+        ordering_rules: A list of tuples representing the ordering rules, or a RuleIndex.
+        update: A list of page numbers representing the update.
+
+    Returns:
+        The middle page number of the corrected update.
+    """
+    index = as_rule_index(ordering_rules)
+    pages = set(update)
+    size = len(update)
+    ranked: List[int] = [None] * size
+    for page in pages:
+        count = len(index.successors.get(page, set()) & pages)
+        if ranked[size - 1 - count] is not None:
+            break
+        ranked[size - 1 - count] = page
+    else:
+        if len(pages) == size and index.is_update_correct(ranked):
+            return find_middle_page(ranked)
+    return find_middle_page(correct_update_order(index, update))
+
+def sum_of_corrected_middle_pages(ordering_rules: Rules, updates: List[List[int]]) -> int:
     """
     Calculates the sum of middle page numbers after correcting the order of incorrectly ordered updates.
 
     Args:
-        ordering_rules: A list of tuples representing the ordering rules.
+        ordering_rules: A list of tuples representing the ordering rules, or a RuleIndex.
         updates: A list of updates, each update is a list of page numbers.
 
     Returns:
         The sum of middle page numbers after correcting the order of incorrectly ordered updates.
     """
+    ordering_rules = as_rule_index(ordering_rules)
     total = 0
     for update in updates:
         if not is_update_correct(ordering_rules, update):
-            corrected_update = correct_update_order(ordering_rules, update)
-            total += find_middle_page(corrected_update)
+            total += find_corrected_middle_page(ordering_rules, update)
     return total
 
 class TestPrintQueue(unittest.TestCase):
@@ -192,6 +539,28 @@ class TestPrintQueue(unittest.TestCase):
         self.assertEqual(self.ordering_rules, expected_rules)
         self.assertEqual(self.updates, expected_updates)
 
+    def test_split_sections(self):
+        """Test that the sections parse to the same rules and updates as parse_input."""
+        rules_str, updates_str = split_sections(self.sample_input)
+        self.assertEqual(parse_input(rules_str)[0], self.ordering_rules)
+        self.assertEqual(parse_updates(updates_str), self.updates)
+
+    def test_rules_snapshot(self):
+        """Test that snapshots round-trip and are rebuilt when the rules change."""
+        import tempfile
+
+        rules_str, _ = split_sections(self.sample_input)
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, 'rules.bin')
+            self.assertIsNone(read_rules_snapshot(snapshot_path, rules_str))
+            self.assertEqual(load_rules(rules_str, snapshot_path), self.ordering_rules)
+            self.assertEqual(read_rules_snapshot(snapshot_path, rules_str), self.ordering_rules)
+
+            changed_str = rules_str + '\n13|99'
+            self.assertIsNone(read_rules_snapshot(snapshot_path, changed_str))
+            self.assertEqual(load_rules(changed_str, snapshot_path)[-1], (13, 99))
+            self.assertEqual(read_rules_snapshot(snapshot_path, changed_str)[-1], (13, 99))
+
     def test_is_update_correct(self):
         """Test checking if updates are correctly ordered."""
         self.assertTrue(is_update_correct(self.ordering_rules, [75, 47, 61, 53, 29]))
@@ -201,6 +570,76 @@ class TestPrintQueue(unittest.TestCase):
         self.assertFalse(is_update_correct(self.ordering_rules, [61, 13, 29]))
         self.assertFalse(is_update_correct(self.ordering_rules, [97, 13, 75, 29, 47]))
 
+    def test_rule_index(self):
+        """Test that the indexed rules agree with the rule list."""
+        index = RuleIndex(self.ordering_rules)
+        self.assertTrue(index.must_precede(47, 53))
+        self.assertFalse(index.must_precede(53, 47))
+        for update in self.updates:
+            self.assertEqual(is_update_correct(index, update),
+                             is_update_correct(self.ordering_rules, update))
+        self.assertEqual(sum_of_middle_pages(index, self.updates), 143)
+        self.assertEqual(sum_of_corrected_middle_pages(index, self.updates), 123)
+
+    def test_rule_index_non_adjacent_violation(self):
+        """Test a violation between pages that are not adjacent in the update."""
+        index = RuleIndex([(3, 1)])
+        self.assertFalse(index.is_update_correct([1, 2, 3]))
+        self.assertFalse(is_update_correct([(3, 1)], [1, 2, 3]))
+
+    def test_rule_index_matches_rule_list(self):
+        """Test that the index agrees with the rule-list path on self-rules and repeats."""
+        cases = [([(5, 5)], [5]), ([(5, 5)], [4]), ([(1, 2)], [1, 2, 1]),
+                 ([(3, 2)], [2, 1, 3, 3, 2])]
+        rng = random.Random(13)
+        for _ in range(2000):
+            rules = [(rng.randint(1, 5), rng.randint(1, 5)) for _ in range(rng.randint(0, 6))]
+            cases.append((rules, [rng.randint(1, 5) for _ in range(rng.randint(0, 6))]))
+        for rules, update in cases:
+            self.assertEqual(RuleIndex(rules).is_update_correct(update),
+                             is_update_correct(rules, update), (rules, update))
+
+    def test_precedence_closure(self):
+        """Test closure queries, cycle detection and incremental rules."""
+        closure = PrecedenceClosure(RuleIndex([(1, 2), (2, 3), (4, 5)]))
+        self.assertEqual(closure.estimate_bytes(), 5 * 101)
+        with self.assertRaises(MemoryError):
+            closure.build(max_bytes=10)
+        closure.build()
+        self.assertTrue(closure.must_precede(1, 3))
+        self.assertFalse(closure.must_precede(3, 1))
+        self.assertFalse(closure.must_precede(1, 5))
+        self.assertEqual(closure.find_cycles(), [])
+
+        closure.add_rule(3, 4)
+        self.assertTrue(closure.must_precede(1, 5))
+        closure.add_rule(5, 1)
+        self.assertTrue(closure.must_precede(3, 1))
+        self.assertTrue(closure.must_precede(2, 2))
+        self.assertEqual(sorted(map(sorted, closure.find_cycles())), [[1, 2, 3, 4, 5]])
+        self.assertEqual(closure.find_cycles([1, 2, 3]), [])
+        self.assertEqual(PrecedenceClosure(RuleIndex(list(closure.index.ordering_rules))).build().reach,
+                         closure.reach)
+
+    def test_precedence_closure_add_rule_is_private(self):
+        """Test that add_rule does not leak into the caller's rules or index."""
+        rules = [(1, 2), (2, 3)]
+        index = RuleIndex(rules)
+        PrecedenceClosure(index).build().add_rule(3, 1)
+        self.assertEqual(rules, [(1, 2), (2, 3)])
+        self.assertEqual(index.ordering_rules, [(1, 2), (2, 3)])
+        self.assertFalse(index.must_precede(3, 1))
+        self.assertEqual(sum_of_corrected_middle_pages(index, [[3, 2, 1]]), 2)
+
+    def test_precedence_closure_sample(self):
+        """Test the sample rules: consistent, and the closure agrees with the direct rules."""
+        index = RuleIndex(self.ordering_rules)
+        closure = PrecedenceClosure(index).build()
+        self.assertEqual(closure.find_cycles(), [])
+        for x, y in self.ordering_rules:
+            self.assertTrue(closure.must_precede(x, y))
+            self.assertFalse(closure.must_precede(y, x))
+
     def test_find_middle_page(self):
         """Test finding the middle page of an update."""
         self.assertEqual(find_middle_page([75, 47, 61, 53, 29]), 61)
@@ -226,6 +665,17 @@ class TestPrintQueue(unittest.TestCase):
         corrected_update3 = correct_update_order(self.ordering_rules, [97, 13, 75, 29, 47])
         self.assertEqual(corrected_update3, [97, 75, 47, 29, 13])
 
+    def test_find_corrected_middle_page(self):
+        """Test the middle page of corrected updates, with and without a total order."""
+        self.assertEqual(find_corrected_middle_page(self.ordering_rules, [75, 97, 47, 61, 53]), 47)
+        self.assertEqual(find_corrected_middle_page(self.ordering_rules, [61, 13, 29]), 29)
+        self.assertEqual(find_corrected_middle_page(self.ordering_rules, [97, 13, 75, 29, 47]), 47)
+        partial_rules = [(3, 1), (2, 1)]
+        self.assertEqual(find_corrected_middle_page(partial_rules, [1, 2, 3]),
+                         find_middle_page(correct_update_order(partial_rules, [1, 2, 3])))
+        with self.assertRaises(ValueError):
+            find_corrected_middle_page([(1, 2), (2, 3), (3, 1)], [1, 2, 3])
+
     def test_sum_of_corrected_middle_pages(self):
         """Test calculating the sum of middle pages after correcting updates."""
         total = sum_of_corrected_middle_pages(self.ordering_rules, self.updates)
@@ -235,7 +685,9 @@ def main():
     """Main function to process the input file and calculate the result for both parts."""
     with open('input5.txt', 'r') as file:
         input_str = file.read()
-    ordering_rules, updates = parse_input(input_str)
+    rules_str, updates_str = split_sections(input_str)
+    ordering_rules = RuleIndex(load_rules(rules_str, 'input5.rules.bin'))
+    updates = parse_updates(updates_str)
 
     # Part One
     total_correct = sum_of_middle_pages(ordering_rules, updates)
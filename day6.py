@@ -1,18 +1,32 @@
+import os
+import random
 import sys
 import unittest
-from typing import List, Tuple
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple, Union
 
-def find_guard_start_and_direction(grid: List[str]) -> Tuple[int, int, int]:
+from grid import PAD, Grid
+
+DIRECTIONS = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+OBSTACLE = ord('#')
+EDGE = PAD[0]
+
+GridLike = Union[List[str], Grid]
+
+def find_guard_start_and_direction(grid: GridLike) -> Tuple[int, int, int]:
     direction_map = {'^': 0, '>': 1, 'v': 2, '<': 3}
-    rows = len(grid)
-    cols = len(grid[0]) if rows > 0 else 0
-    for r in range(rows):
-        for c in range(cols):
-            if grid[r][c] in direction_map:
-                return r, c, direction_map[grid[r][c]]
-    return None, None, None
+    grid = Grid.coerce(grid)
+    found = [(position, dir_idx) for char, dir_idx in direction_map.items()
+             if (position := grid.find(char)) is not None]
+    if not found:
+        return None, None, None
+    (r, c), dir_idx = min(found)
+    return r, c, dir_idx
 
-def simulate_guard_part1(grid: List[str]) -> int:
+def simulate_guard_part1(grid: GridLike) -> int:
     """
     Part One simulation:
     Simulates the guard's movement and returns the number of unique positions visited.
@@ -22,39 +36,85 @@ def simulate_guard_part1(grid: List[str]) -> int:
     - If there's an obstacle '#' or going forward would leave the map, turn right (90 degrees).
     - Otherwise, step forward.
     """
-    DIRECTIONS = [(-1, 0), (0, 1), (1, 0), (0, -1)]
-    rows = len(grid)
-    cols = len(grid[0]) if rows > 0 else 0
+    grid = Grid.coerce(grid)
+    data = grid.data
+    steps = [dr * grid.stride + dc for dr, dc in DIRECTIONS]
 
     start_r, start_c, dir_idx = find_guard_start_and_direction(grid)
 
-    visited = set()
-    visited.add((start_r, start_c))
-    current_r, current_c = start_r, start_c
+    visited = bytearray(len(data))
+    current = grid.index(start_r, start_c)
+    visited[current] = 1
 
     while True:
-        dr, dc = DIRECTIONS[dir_idx]
-        front_r = current_r + dr
-        front_c = current_c + dc
+        front = current + steps[dir_idx]
 
-        # Check if next step goes off map
-        if not (0 <= front_r < rows and 0 <= front_c < cols):
+        # The padding around the grid marks the edge of the map
+        if data[front] == EDGE:
             # Guard leaves the map
             break
 
         # Check obstacle
-        if grid[front_r][front_c] == '#':
+        if data[front] == OBSTACLE:
             # Turn right
             dir_idx = (dir_idx + 1) % 4
             continue
 
         # Move forward
-        current_r, current_c = front_r, front_c
-        visited.add((current_r, current_c))
+        current = front
+        visited[current] = 1
+
+    return visited.count(1)
+
+class StateTracker:
+    """
+    Flat, reusable store of visited guard states and cells.
+
+    State (r, c, dir_idx) lives at byte (r * cols + c) * 4 + dir_idx and
+    cell (r, c) at byte r * cols + c. A byte counts as set only if it holds
+    the current generation, so starting a new simulation is a counter bump
+    instead of clearing; the bytes are only wiped once every 255 runs.
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.cols = cols
+        self.states = bytearray(rows * cols * 4)
+        self.cells = bytearray(rows * cols)
+        self.generation = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.generation += 1
+        if self.generation == 256:
+            self.states[:] = bytes(len(self.states))
+            self.cells[:] = bytes(len(self.cells))
+            self.generation = 1
 
-    return len(visited)
+    def visit_state(self, r: int, c: int, dir_idx: int) -> bool:
+        """Marks the state; returns True if it was already visited."""
+        i = (r * self.cols + c) * 4 + dir_idx
+        if self.states[i] == self.generation:
+            return True
+        self.states[i] = self.generation
+        return False
 
-def simulate_with_loop_detection(grid: List[str]) -> Tuple[bool, int]:
+    def visit_state_id(self, state: int) -> bool:
+        """Same as visit_state, for a state already flattened to its index."""
+        if self.states[state] == self.generation:
+            return True
+        self.states[state] = self.generation
+        return False
+
+    def visit_cell(self, r: int, c: int) -> bool:
+        """Marks the cell; returns True if it was already visited."""
+        i = r * self.cols + c
+        if self.cells[i] == self.generation:
+            return True
+        self.cells[i] = self.generation
+        return False
+
+def simulate_with_loop_detection(grid: GridLike,
+                                 tracker: Optional[StateTracker] = None) -> Tuple[bool, int]:
     """
     Part Two simulation with loop detection:
     Simulates the guard's movement and detects if the guard gets stuck in a loop.
@@ -63,55 +123,368 @@ def simulate_with_loop_detection(grid: List[str]) -> Tuple[bool, int]:
       
     loop_detected = True if the guard eventually revisits the same position and direction.
     visited_count = number of distinct cells visited.
+
+    A StateTracker for the grid's size can be passed to reuse its memory
+    across simulations.
     """
-    DIRECTIONS = [(-1, 0), (0, 1), (1, 0), (0, -1)]
-    rows = len(grid)
-    cols = len(grid[0]) if rows > 0 else 0
+    grid = Grid.coerce(grid)
+    if tracker is None:
+        tracker = StateTracker(grid.rows, grid.cols)
+    else:
+        tracker.reset()
 
     start_r, start_c, dir_idx = find_guard_start_and_direction(grid)
-    visited_positions = set()
-    visited_positions.add((start_r, start_c))
+    tracker.visit_cell(start_r, start_c)
+    visited_count = 1
     current_r, current_c = start_r, start_c
 
-    visited_states = set()  # (r, c, dir_idx)
-
     while True:
-        state = (current_r, current_c, dir_idx)
-        if state in visited_states:
+        if tracker.visit_state(current_r, current_c, dir_idx):
             # Loop detected
-            return True, len(visited_positions)
-        visited_states.add(state)
+            return True, visited_count
 
         dr, dc = DIRECTIONS[dir_idx]
         front_r = current_r + dr
         front_c = current_c + dc
 
-        # Check if stepping forward goes off the map
-        if not (0 <= front_r < rows and 0 <= front_c < cols):
+        front = grid.data[grid.index(front_r, front_c)]
+
+        # The padding around the grid marks the edge of the map
+        if front == EDGE:
             # Guard leaves the map, no loop
-            return False, len(visited_positions)
+            return False, visited_count
 
         # Check obstacle
-        if grid[front_r][front_c] == '#':
+        if front == OBSTACLE:
             # Turn right
             dir_idx = (dir_idx + 1) % 4
             continue
 
         # Move forward
         current_r, current_c = front_r, front_c
-        visited_positions.add((current_r, current_c))
+        if not tracker.visit_cell(current_r, current_c):
+            visited_count += 1
+
+class ObstacleIndex:
+    """
+    Sorted obstacle positions per row and per column.
+
+    Lets the guard jump from one turn straight to the next with a bisect
+    lookup instead of walking the cells in between.
+    """
+
+    def __init__(self, grid: GridLike):
+        grid = Grid.coerce(grid)
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.row_obstacles = [[] for _ in range(self.rows)]
+        self.col_obstacles = [[] for _ in range(self.cols)]
+        for r, c in grid.find_all('#'):
+            self.row_obstacles[r].append(c)
+            self.col_obstacles[c].append(r)
+
+    def next_stop(self, r: int, c: int, dir_idx: int,
+                  extra: Optional[Tuple[int, int]] = None) -> Tuple[int, int, bool]:
+        """
+        Where the guard at (r, c) facing dir_idx stops walking straight.
+
+        extra is an optional additional obstacle, overlaid without touching
+        the index. Returns (stop_r, stop_c, leaves) where leaves is True if
+        the guard walks off the map after (stop_r, stop_c).
+        """
+        if dir_idx % 2 == 0:
+            line, pos, other = self.col_obstacles[c], r, c
+            extra_pos = extra[0] if extra and extra[1] == c else None
+        else:
+            line, pos, other = self.row_obstacles[r], c, r
+            extra_pos = extra[1] if extra and extra[0] == r else None
+        i = bisect_left(line, pos)
+        if dir_idx in (0, 3):
+            # Moving towards lower indices: nearest obstacle before pos
+            blocker = line[i - 1] if i > 0 else None
+            if extra_pos is not None and extra_pos < pos and (blocker is None or extra_pos > blocker):
+                blocker = extra_pos
+            stop = 0 if blocker is None else blocker + 1
+        else:
+            blocker = line[i] if i < len(line) else None
+            if extra_pos is not None and extra_pos > pos and (blocker is None or extra_pos < blocker):
+                blocker = extra_pos
+            limit = self.rows if dir_idx == 2 else self.cols
+            stop = limit - 1 if blocker is None else blocker - 1
+        if dir_idx % 2 == 0:
+            return stop, other, blocker is None
+        return other, stop, blocker is None
 
-def count_loop_positions(grid: List[str]) -> int:
+def simulate_guard_jumps(grid: GridLike) -> int:
+    """
+    Part One with turn-to-turn jumps:
+    Same result as simulate_guard_part1, but the guard jumps to its next turn
+    through an ObstacleIndex and the walked segments are painted into a flat
+    bytearray, so the work is proportional to the number of turns.
+    """
+    index = ObstacleIndex(grid)
+    cols = index.cols
+    current_r, current_c, dir_idx = find_guard_start_and_direction(grid)
+    visited = bytearray(index.rows * cols)
+
+    while True:
+        stop_r, stop_c, leaves = index.next_stop(current_r, current_c, dir_idx)
+        start = current_r * cols + current_c
+        end = stop_r * cols + stop_c
+        step = 1 if dir_idx % 2 else cols
+        if end < start:
+            start, end = end, start
+        visited[start:end + 1:step] = b"\x01" * ((end - start) // step + 1)
+        if leaves:
+            return visited.count(1)
+        current_r, current_c, dir_idx = stop_r, stop_c, (dir_idx + 1) % 4
+
+def loops_from(index: ObstacleIndex, current_r: int, current_c: int, dir_idx: int,
+               extra: Optional[Tuple[int, int]] = None,
+               tracker: Optional[StateTracker] = None) -> bool:
+    """
+    Returns True if the guard at (current_r, current_c) facing dir_idx gets
+    stuck in a loop. Only the states at turns are remembered; a repeated turn
+    state means a loop. extra is an optional additional obstacle, and tracker
+    an optional StateTracker to reuse.
+    """
+    if tracker is None:
+        tracker = StateTracker(index.rows, index.cols)
+    else:
+        tracker.reset()
+    while True:
+        current_r, current_c, leaves = index.next_stop(current_r, current_c, dir_idx, extra)
+        if leaves:
+            return False
+        if tracker.visit_state(current_r, current_c, dir_idx):
+            return True
+        dir_idx = (dir_idx + 1) % 4
+
+def simulate_with_loop_detection_jumps(grid: GridLike, index: Optional[ObstacleIndex] = None,
+                                       extra: Optional[Tuple[int, int]] = None) -> bool:
+    """
+    Loop detection with turn-to-turn jumps:
+    Returns True if the guard gets stuck in a loop, optionally with an extra
+    obstacle overlaid on the map.
+    """
+    index = index or ObstacleIndex(grid)
+    start_r, start_c, dir_idx = find_guard_start_and_direction(grid)
+    return loops_from(index, start_r, start_c, dir_idx, extra)
+
+def loop_candidates(grid: Grid, index: ObstacleIndex) -> List[Tuple[int, int, int, int, int]]:
+    """
+    The cells where an obstacle could change the guard's route.
+
+    Returns (r, c, from_r, from_c, dir_idx) tuples: each '.' cell on the
+    guard's original path, with the state just before the guard first enters
+    it. Up to that state the route is unaffected by an obstacle on (r, c),
+    so its simulation can resume there. If the original route already loops,
+    every '.' cell is a candidate resumed from the start.
+    """
+    start_r, start_c, start_dir = find_guard_start_and_direction(grid)
+    dir_idx = start_dir
+    cols = index.cols
+    tracker = StateTracker(index.rows, cols)
+    tracker.visit_cell(start_r, start_c)
+    candidates = []
+    current_r, current_c = start_r, start_c
+    while True:
+        stop_r, stop_c, leaves = index.next_stop(current_r, current_c, dir_idx)
+        dr, dc = DIRECTIONS[dir_idx]
+        r, c = current_r, current_c
+        while (r, c) != (stop_r, stop_c):
+            next_r, next_c = r + dr, c + dc
+            if not tracker.visit_cell(next_r, next_c):
+                if grid.at(next_r, next_c) == '.':
+                    candidates.append((next_r, next_c, r, c, dir_idx))
+            r, c = next_r, next_c
+        if leaves:
+            return candidates
+        if tracker.visit_state(stop_r, stop_c, dir_idx):
+            return [(r, c, start_r, start_c, start_dir) for r, c in grid.find_all('.')]
+        current_r, current_c, dir_idx = stop_r, stop_c, (dir_idx + 1) % 4
+
+class TransitionGraph:
+    """
+    Turn-to-turn successor of every guard state, as one flat integer array.
+
+    State (r, c, dir_idx) has id (r * cols + c) * 4 + dir_idx, the same
+    layout as StateTracker. successors[id] is the state in which the guard
+    next turns: the cell in front of the next obstacle, already facing the
+    new direction, or -1 if the guard walks off the map instead.
+    """
+
+    @classmethod
+    def from_successors(cls, successors, rows: int, cols: int) -> 'TransitionGraph':
+        """Wraps an already built successor table (an array or a memoryview of ints)."""
+        graph = cls.__new__(cls)
+        graph.rows, graph.cols, graph.successors = rows, cols, successors
+        return graph
+
+    def __init__(self, grid: GridLike):
+        grid = Grid.coerce(grid)
+        data = grid.data
+        self.rows = rows = grid.rows
+        self.cols = cols = grid.cols
+        # State ids stay below 4 * rows * cols, well within 32 bits
+        self.successors = successors = array('i', [-1]) * (rows * cols * 4)
+        for dir_idx, (dr, dc) in enumerate(DIRECTIONS):
+            turn_dir = (dir_idx + 1) % 4
+            # Sweep each line against the walking direction, remembering the
+            # last free cell after an obstacle: that is where the guard would turn
+            if dr:
+                lines, length, step = range(cols), rows, -dr
+            else:
+                lines, length, step = range(rows), cols, -dc
+            along = range(length) if step > 0 else range(length - 1, -1, -1)
+            for line in lines:
+                turn_state = -1
+                after_obstacle = False
+                for k in along:
+                    r, c = (k, line) if dr else (line, k)
+                    if data[grid.index(r, c)] == OBSTACLE:
+                        after_obstacle = True
+                        continue
+                    cell = (r * cols + c) * 4
+                    if after_obstacle:
+                        turn_state = cell + turn_dir
+                        after_obstacle = False
+                    successors[cell + dir_idx] = turn_state
+
+    def state_id(self, r: int, c: int, dir_idx: int) -> int:
+        return (r * self.cols + c) * 4 + dir_idx
+
+    def successor(self, state: int, extra: Optional[Tuple[int, int]] = None) -> int:
+        """
+        The successor of a state with an optional extra obstacle patched in.
+
+        Only a state whose straight run passes the extra obstacle before its
+        own turn (or the map edge) changes; every other transition is read
+        from the table as is.
+        """
+        following = self.successors[state]
+        if extra is None:
+            return following
+        cell, dir_idx = divmod(state, 4)
+        r, c = divmod(cell, self.cols)
+        extra_r, extra_c = extra
+        dr, dc = DIRECTIONS[dir_idx]
+        if dr:
+            if extra_c != c or (extra_r - r) * dr <= 0:
+                return following
+            distance = (extra_r - r) * dr
+        else:
+            if extra_r != r or (extra_c - c) * dc <= 0:
+                return following
+            distance = (extra_c - c) * dc
+        if following != -1:
+            turn_r, turn_c = divmod(following // 4, self.cols)
+            if distance > abs(turn_r - r) + abs(turn_c - c):
+                return following
+        stop_r, stop_c = extra_r - dr, extra_c - dc
+        return (stop_r * self.cols + stop_c) * 4 + (dir_idx + 1) % 4
+
+    def loops_from(self, state: int, extra: Optional[Tuple[int, int]] = None,
+                   tracker: Optional[StateTracker] = None) -> bool:
+        """
+        Returns True if the guard starting in state gets stuck in a loop,
+        following the graph patched with the optional extra obstacle.
+        """
+        if tracker is None:
+            tracker = StateTracker(self.rows, self.cols)
+        else:
+            tracker.reset()
+        while True:
+            state = self.successor(state, extra)
+            if state == -1:
+                return False
+            if tracker.visit_state_id(state):
+                return True
+
+def find_loop_positions(grid: GridLike) -> List[Tuple[int, int]]:
+    """
+    For Part Two:
+    Lists the '.' positions (excluding guard's start) where a new obstacle
+    makes the guard loop. Only cells on the guard's path are tried, each
+    resumed from just before the guard first reaches it, with the obstacle
+    overlaid instead of copying the grid: each try walks the precomputed
+    TransitionGraph with only the transitions the obstacle affects patched.
+    """
+    grid = Grid.coerce(grid)
+    index = ObstacleIndex(grid)
+    graph = TransitionGraph(grid)
+    tracker = StateTracker(index.rows, index.cols)
+    return [(r, c) for r, c, from_r, from_c, dir_idx in loop_candidates(grid, index)
+            if graph.loops_from(graph.state_id(from_r, from_c, dir_idx), (r, c), tracker)]
+
+# Per-process state of the loop search workers, set up once by _init_loop_worker
+_worker_shm: Optional[SharedMemory] = None
+_worker_graph: Optional[TransitionGraph] = None
+_worker_tracker: Optional[StateTracker] = None
+
+def _init_loop_worker(shm_name: str, rows: int, cols: int) -> None:
+    global _worker_shm, _worker_graph, _worker_tracker
+    # The block stays open for the life of the worker: the graph reads the
+    # parent's successor table straight from it, without building or copying
+    _worker_shm = SharedMemory(name=shm_name)
+    size = rows * cols * 4 * array('i').itemsize
+    successors = _worker_shm.buf[:size].cast('i')
+    _worker_graph = TransitionGraph.from_successors(successors, rows, cols)
+    _worker_tracker = StateTracker(rows, cols)
+
+def _loop_positions_in_batch(batch: List[Tuple[int, int, int, int, int]]) -> List[Tuple[int, int]]:
+    return [(r, c) for r, c, from_r, from_c, dir_idx in batch
+            if _worker_graph.loops_from(_worker_graph.state_id(from_r, from_c, dir_idx),
+                                        (r, c), _worker_tracker)]
+
+def find_loop_positions_parallel(grid: GridLike, workers: Optional[int] = None,
+                                 batch_size: int = 256) -> List[Tuple[int, int]]:
+    """
+    For Part Two, on a process pool:
+    Same result, in the same order, as find_loop_positions. The TransitionGraph
+    is built once here and its successor table put into a read-only shared
+    memory block that every worker maps when it starts, so workers build
+    nothing and tasks only carry batches of candidate cells. workers defaults
+    to the number of cores.
+    """
+    grid = Grid.coerce(grid)
+    index = ObstacleIndex(grid)
+    graph = TransitionGraph(grid)
+    candidates = loop_candidates(grid, index)
+    batches = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+    table = memoryview(graph.successors).cast('B')
+    shm = SharedMemory(create=True, size=max(1, len(table)))
+    try:
+        shm.buf[:len(table)] = table
+        table.release()
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=_init_loop_worker,
+                                 initargs=(shm.name, graph.rows, graph.cols)) as executor:
+            results = executor.map(_loop_positions_in_batch, batches)
+            return [position for batch in results for position in batch]
+    finally:
+        shm.close()
+        shm.unlink()
+
+def count_loop_positions(grid: GridLike) -> int:
     """
     For Part Two:
     Counts how many '.' positions (excluding guard's start) can be changed to '#'
     to cause the guard to loop instead of leaving the map.
     """
+    return len(find_loop_positions(grid))
+
+def count_loop_positions_brute_force(grid: List[str]) -> int:
+    """
+    Reference for count_loop_positions: tries every '.' cell on a copy of the
+    grid and simulates from the start.
+    """
     rows = len(grid)
     cols = len(grid[0]) if rows > 0 else 0
 
     grid_list = [list(row) for row in grid]
     start_r, start_c, _ = find_guard_start_and_direction(grid)
+    tracker = StateTracker(rows, cols)
 
     loop_count = 0
     for r in range(rows):
@@ -123,7 +496,7 @@ def count_loop_positions(grid: List[str]) -> int:
                 original = grid_list[r][c]
                 grid_list[r][c] = '#'
                 modified_grid = ["".join(row) for row in grid_list]
-                loop_detected, _ = simulate_with_loop_detection(modified_grid)
+                loop_detected, _ = simulate_with_loop_detection(modified_grid, tracker)
                 if loop_detected:
                     loop_count += 1
                 # Restore
@@ -131,6 +504,18 @@ def count_loop_positions(grid: List[str]) -> int:
 
     return loop_count
 
+def _random_maps(seed: int, count: int, max_size: int = 8) -> List[List[str]]:
+    """Random guard maps with about 20% obstacles, seeded for repeatable tests."""
+    rng = random.Random(seed)
+    maps = []
+    for _ in range(count):
+        rows, cols = rng.randint(1, max_size), rng.randint(1, max_size)
+        cells = [['#' if rng.random() < 0.2 else '.' for _ in range(cols)]
+                 for _ in range(rows)]
+        cells[rng.randrange(rows)][rng.randrange(cols)] = rng.choice('^>v<')
+        maps.append(["".join(row) for row in cells])
+    return maps
+
 class TestPart1(unittest.TestCase):
     def test_example_given(self):
         # Example from the puzzle description for part one
@@ -172,7 +557,105 @@ class TestPart1(unittest.TestCase):
         # Only start visited.
         self.assertEqual(simulate_guard_part1(grid), 1)
 
+class TestJumps(unittest.TestCase):
+    example_map = [
+        "....#.....",
+        ".........#",
+        "..........",
+        "..#.......",
+        ".......#..",
+        "..........",
+        ".#..^.....",
+        "........#.",
+        "#.........",
+        "......#..."
+    ]
+
+    def test_part1_jumps(self):
+        self.assertEqual(simulate_guard_jumps(self.example_map), 41)
+        self.assertEqual(simulate_guard_jumps(["..^..", ".....", "....."]), 1)
+        self.assertEqual(simulate_guard_jumps(["#^#", "###", "###"]), 1)
+
+    def test_next_stop_with_extra_obstacle(self):
+        index = ObstacleIndex(self.example_map)
+        self.assertEqual(index.next_stop(6, 4, 0), (1, 4, False))
+        self.assertEqual(index.next_stop(6, 4, 0, extra=(3, 4)), (4, 4, False))
+        self.assertEqual(index.next_stop(6, 4, 0, extra=(7, 4)), (1, 4, False))
+        self.assertEqual(index.next_stop(6, 4, 3, extra=(6, 3)), (6, 4, False))
+        self.assertEqual(index.next_stop(8, 4, 2), (9, 4, True))
+
+    def test_loop_detection_jumps(self):
+        grid = list(self.example_map)
+        for r, row in enumerate(grid):
+            for c, cell in enumerate(row):
+                if cell != '.':
+                    continue
+                modified = list(grid)
+                modified[r] = row[:c] + '#' + row[c + 1:]
+                expected, _ = simulate_with_loop_detection(modified)
+                self.assertEqual(simulate_with_loop_detection_jumps(grid, extra=(r, c)), expected)
+                self.assertEqual(simulate_with_loop_detection_jumps(modified), expected)
+
+class TestTransitionGraph(unittest.TestCase):
+    def test_successors_match_jumps(self):
+        grid = TestJumps.example_map
+        index = ObstacleIndex(grid)
+        graph = TransitionGraph(grid)
+        for r, row in enumerate(grid):
+            for c, cell in enumerate(row):
+                if cell == '#':
+                    continue
+                for dir_idx in range(4):
+                    for extra in (None, (6, 3), (2, 4), (r, 0), (0, c)):
+                        if extra and grid[extra[0]][extra[1]] == '#':
+                            continue
+                        stop_r, stop_c, leaves = index.next_stop(r, c, dir_idx, extra)
+                        expected = -1 if leaves else graph.state_id(stop_r, stop_c, (dir_idx + 1) % 4)
+                        self.assertEqual(graph.successor(graph.state_id(r, c, dir_idx), extra),
+                                         expected, (r, c, dir_idx, extra))
+
+class TestStateTracker(unittest.TestCase):
+    def test_generations(self):
+        tracker = StateTracker(2, 3)
+        self.assertFalse(tracker.visit_state(1, 2, 3))
+        self.assertTrue(tracker.visit_state(1, 2, 3))
+        self.assertFalse(tracker.visit_cell(1, 2))
+        self.assertTrue(tracker.visit_cell(1, 2))
+        for _ in range(300):
+            tracker.reset()
+            self.assertFalse(tracker.visit_state(1, 2, 3))
+            self.assertFalse(tracker.visit_cell(0, 0))
+        self.assertEqual(len(tracker.states), 2 * 3 * 4)
+
+    def test_simulation_reuses_tracker(self):
+        grid = TestJumps.example_map
+        tracker = StateTracker(len(grid), len(grid[0]))
+        for _ in range(3):
+            self.assertEqual(simulate_with_loop_detection(grid, tracker), (False, 41))
+
 class TestPart2(unittest.TestCase):
+    def test_example_loop_positions(self):
+        positions = find_loop_positions(TestJumps.example_map)
+        self.assertEqual(sorted(positions),
+                         [(6, 3), (7, 6), (7, 7), (8, 1), (8, 3), (9, 7)])
+        self.assertEqual(count_loop_positions(TestJumps.example_map), 6)
+
+    def test_matches_brute_force(self):
+        for grid in _random_maps(18, 30):
+            self.assertEqual(count_loop_positions(grid), count_loop_positions_brute_force(grid))
+
+    def test_parallel_matches_serial(self):
+        for grid in [TestJumps.example_map] + _random_maps(19, 5, max_size=20):
+            self.assertEqual(find_loop_positions_parallel(grid, workers=2, batch_size=4),
+                             find_loop_positions(grid))
+
+    def test_original_route_loops(self):
+        grid = [".#...",
+                "....#",
+                "#^...",
+                "...#."]
+        self.assertEqual(count_loop_positions(grid), count_loop_positions_brute_force(grid))
+
     def test_part2_small_scenario(self):
         # A small scenario for part two
         grid = [
@@ -184,15 +667,13 @@ class TestPart2(unittest.TestCase):
 
 def main_part1():
     # Reads from 'input6.txt' and prints part1 result (number of distinct visited positions)
-    with open('input6.txt', 'r') as f:
-        grid = [line.rstrip('\n') for line in f]
+    grid = Grid.from_file('input6.txt')
     result = simulate_guard_part1(grid)
     print(result)
 
 def main_part2():
     # Reads from 'input6.txt' and prints part2 result (number of positions causing loops)
-    with open('input6.txt', 'r') as f:
-        grid = [line.rstrip('\n') for line in f]
+    grid = Grid.from_file('input6.txt')
     result = count_loop_positions(grid)
     print(result)
 
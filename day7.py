@@ -1,6 +1,223 @@
+import random
 import sys
 import unittest
 from itertools import product
+from typing import Callable, NamedTuple, Optional, Sequence
+
+
+def _concat_multiplier(number: int) -> int:
+    """Power of ten that shifts a value left past the digits of number."""
+    multiplier = 10
+    while multiplier <= number:
+        multiplier *= 10
+    return multiplier
+
+
+# Returned by an inverse when every left operand gives the result
+ANY_LEFT = object()
+
+
+class Operator(NamedTuple):
+    """
+    A binary operator for the calibration equations.
+
+    forward(left, right) evaluates it. inverse(result, right), if given,
+    returns the only left operand that produces result, None if there is
+    none, or ANY_LEFT if every left operand does. non_decreasing declares
+    that forward(left, right) >= left for positive operands, which lets the
+    forward search drop values that already exceed the target.
+    """
+    symbol: str
+    forward: Callable[[int, int], int]
+    inverse: Optional[Callable[[int, int], object]] = None
+    non_decreasing: bool = False
+
+
+def _unmultiply(result: int, right: int) -> object:
+    if right == 0:
+        return ANY_LEFT if result == 0 else None
+    return result // right if result % right == 0 else None
+
+
+def _unconcat(result: int, right: int) -> object:
+    multiplier = _concat_multiplier(right)
+    if result < right or (result - right) % multiplier:
+        return None
+    return (result - right) // multiplier
+
+
+OPERATORS: dict[str, Operator] = {}
+
+
+def register_operator(operator: Operator) -> Operator:
+    """Make an operator available to solve_equations by its symbol."""
+    OPERATORS[operator.symbol] = operator
+    return operator
+
+
+register_operator(Operator(
+    '+', lambda left, right: left + right,
+    lambda result, right: result - right if result >= right else None,
+    non_decreasing=True))
+register_operator(Operator('*', lambda left, right: left * right,
+                           _unmultiply, non_decreasing=True))
+register_operator(Operator(
+    '||', lambda left, right: left * _concat_multiplier(right) + right,
+    _unconcat, non_decreasing=True))
+
+PART1_OPERATORS = ('+', '*')
+PART2_OPERATORS = ('+', '*', '||')
+
+
+def _resolve(operators: Sequence) -> list[Operator]:
+    return [OPERATORS[op] if isinstance(op, str) else op for op in operators]
+
+
+def _search_backward(target: int, numbers: list[int], operators: list[Operator],
+                     first_only: bool = False) -> tuple[int, dict]:
+    """
+    Work right to left, undoing an operator only where its inverse says it
+    is possible, so dead branches are cut as soon as they appear.
+
+    Returns the number of solutions and the memo, which maps every explored
+    (position, value) pair to its count and a back-pointer: the symbol and
+    left operand of its first solution, or None. With first_only the search
+    stops at the first solution, so the count is only known to be nonzero.
+    """
+    memo: dict[tuple[int, int], tuple[int, Optional[tuple[str, object]]]] = {}
+
+    def solve(value: int, last: int) -> int:
+        if last == 0:
+            return int(value == numbers[0])
+        key = (last, value)
+        if key in memo:
+            return memo[key][0]
+        ways = 0
+        back = None
+        for operator in operators:
+            left = operator.inverse(value, numbers[last])
+            if left is None:
+                continue
+            found = len(operators) ** (last - 1) if left is ANY_LEFT \
+                else solve(left, last - 1)
+            if found:
+                ways += found
+                back = back or (operator.symbol, left)
+                if first_only:
+                    break
+        memo[key] = (ways, back)
+        return ways
+
+    return solve(target, len(numbers) - 1), memo
+
+
+def _search_forward(target: int, numbers: list[int],
+                    operators: list[Operator]) -> tuple[int, list[dict]]:
+    """
+    Work left to right over the distinct values reachable at each position.
+    Values above the target are dropped when every operator is
+    non-decreasing and the operands are positive.
+
+    Returns the number of solutions and one layer per position, mapping each
+    reachable value to its count and a back-pointer: the previous value and
+    symbol it was first reached from.
+    """
+    prune = all(op.non_decreasing for op in operators) and \
+        all(number > 0 for number in numbers)
+    layers: list[dict[int, tuple[int, Optional[tuple[int, str]]]]] = \
+        [{numbers[0]: (1, None)}]
+    for number in numbers[1:]:
+        layer = {}
+        for value, (ways, _) in layers[-1].items():
+            for operator in operators:
+                result = operator.forward(value, number)
+                if prune and result > target:
+                    continue
+                if result in layer:
+                    layer[result] = (layer[result][0] + ways, layer[result][1])
+                else:
+                    layer[result] = (ways, (value, operator.symbol))
+        layers.append(layer)
+    return layers[-1].get(target, (0, None))[0], layers
+
+
+def _backward_symbols(target: int, numbers: list[int], operators: list[Operator],
+                      memo: dict) -> list[str]:
+    symbols = []
+    value = target
+    for last in range(len(numbers) - 1, 0, -1):
+        symbol, left = memo[(last, value)][1]
+        symbols.append(symbol)
+        if left is ANY_LEFT:
+            # Every operator works for the positions before this one
+            symbols += [operators[0].symbol] * (last - 1)
+            break
+        value = left
+    symbols.reverse()
+    return symbols
+
+
+def _forward_symbols(target: int, layers: list[dict]) -> list[str]:
+    symbols = []
+    value = target
+    for layer in reversed(layers[1:]):
+        value, symbol = layer[value][1]
+        symbols.append(symbol)
+    symbols.reverse()
+    return symbols
+
+
+def _search(target: int, numbers: list[int], operators: list[Operator],
+            first_only: bool = False) -> tuple[int, Callable[[], list[str]]]:
+    """
+    Run the backward search when every operator defines an inverse, else the
+    forward one. Returns the number of solutions (only known to be nonzero
+    with first_only) and a function that rebuilds the operator symbols of one
+    solution from the back-pointers.
+    """
+    if all(op.inverse for op in operators):
+        ways, memo = _search_backward(target, numbers, operators, first_only)
+        return ways, lambda: _backward_symbols(target, numbers, operators, memo)
+    ways, layers = _search_forward(target, numbers, operators)
+    return ways, lambda: _forward_symbols(target, layers)
+
+
+def can_reach(target: int, numbers: list[int], operators: Sequence) -> bool:
+    """
+    Given a target integer and a list of integers, determine if by inserting
+    the given operators (symbols or Operator objects) between them, evaluated
+    strictly left-to-right, we can produce the target. Operators that all
+    define an inverse get the backward search; otherwise values are
+    propagated forward.
+    """
+    ways, _ = _search(target, numbers, _resolve(operators), first_only=True)
+    return ways > 0
+
+
+def count_solutions(target: int, numbers: list[int], operators: Sequence) -> int:
+    """
+    Count the operator assignments that make numbers evaluate to target.
+    Uses the same memoized searches as can_reach, so no operator pattern is
+    ever enumerated.
+    """
+    ways, _ = _search(target, numbers, _resolve(operators))
+    return ways
+
+
+def find_witness(target: int, numbers: list[int],
+                 operators: Sequence) -> Optional[str]:
+    """
+    Return one expression, e.g. '81 + 40 * 27', that evaluates left to right
+    to target, or None if there is none. Follows the back-pointers of the
+    same memoized searches as can_reach.
+    """
+    ways, symbols = _search(target, numbers, _resolve(operators), first_only=True)
+    if not ways:
+        return None
+    parts = [str(numbers[0])]
+    for symbol, number in zip(symbols(), numbers[1:]):
+        parts += [symbol, str(number)]
+    return " ".join(parts)
 
 
 def can_reach_target(target: int, numbers: list[int]) -> bool:
@@ -9,20 +226,7 @@ def can_reach_target(target: int, numbers: list[int]) -> bool:
     Given a target integer and a list of integers, determine if by inserting
     '+' or '*' between them (in order), evaluated strictly left-to-right, we can produce the target.
     """
-    if len(numbers) == 1:
-        return numbers[0] == target
-
-    # Each operator position can be '+' or '*'
-    for ops_pattern in product(['+', '*'], repeat=len(numbers) - 1):
-        current_value = numbers[0]
-        for i, op in enumerate(ops_pattern, start=1):
-            if op == '+':
-                current_value = current_value + numbers[i]
-            else:  # '*'
-                current_value = current_value * numbers[i]
-        if current_value == target:
-            return True
-    return False
+    return can_reach(target, numbers, PART1_OPERATORS)
 
 
 def can_reach_target_with_all_ops(target: int, numbers: list[int]) -> bool:
@@ -32,11 +236,15 @@ def can_reach_target_with_all_ops(target: int, numbers: list[int]) -> bool:
     '+', '*', or '||' (concatenate) between them (in order), evaluated strictly
     left-to-right, we can produce the target.
     """
-    if len(numbers) == 1:
-        return numbers[0] == target
+    return can_reach(target, numbers, PART2_OPERATORS)
 
-    # Each operator position can be '+', '*', or '||'
-    for ops_pattern in product(['+', '*', '||'], repeat=len(numbers) - 1):
+
+def can_reach_target_brute_force(target: int, numbers: list[int], operators: list[str]) -> bool:
+    """
+    Reference for the solvers above: evaluate every pattern of the given
+    operators ('+', '*', '||') strictly left to right.
+    """
+    for ops_pattern in product(operators, repeat=len(numbers) - 1):
         current_value = numbers[0]
         for i, op in enumerate(ops_pattern, start=1):
             if op == '+':
@@ -50,12 +258,17 @@ def can_reach_target_with_all_ops(target: int, numbers: list[int]) -> bool:
     return False
 
 
-def solve_equations(equations: list[str], part2: bool = False) -> int:
+def solve_equations(equations: list[str], part2: bool = False,
+                    operators: Optional[Sequence] = None) -> int:
     """
     Solve equations for either part1 or part2.
     If part2 is False, only '+' and '*' are used.
     If part2 is True, '+', '*', and '||' are used.
+    An explicit operators set (symbols or Operator objects) overrides both.
     """
+    if operators is None:
+        operators = PART2_OPERATORS if part2 else PART1_OPERATORS
+    operators = _resolve(operators)
     total = 0
     for eq in equations:
         eq = eq.strip()
@@ -65,17 +278,25 @@ def solve_equations(equations: list[str], part2: bool = False) -> int:
         target = int(target_str.strip())
         numbers = list(map(int, nums_str.strip().split()))
 
-        if part2:
-            # Use all operators
-            if can_reach_target_with_all_ops(target, numbers):
-                total += target
-        else:
-            # Use only + and *
-            if can_reach_target(target, numbers):
-                total += target
+        if can_reach(target, numbers, operators):
+            total += target
     return total
 
 
+def _random_cases(seed: int, count: int, max_number: int,
+                  max_target: int) -> list[tuple[list[int], int]]:
+    """Seeded (numbers, target) pairs of 1 to 5 numbers for the differential tests."""
+    rng = random.Random(seed)
+    return [([rng.randint(0, max_number) for _ in range(rng.randint(1, 5))],
+             rng.randint(0, max_target)) for _ in range(count)]
+
+
+def _without_inverses(operators: Sequence) -> list[Operator]:
+    """The operators stripped of their inverses, which forces the forward search."""
+    return [Operator(op.symbol, op.forward, None, op.non_decreasing)
+            for op in _resolve(operators)]
+
+
 class TestPart1(unittest.TestCase):
 
     def test_example(self):
@@ -94,6 +315,90 @@ class TestPart1(unittest.TestCase):
         self.assertEqual(solve_equations(lines, part2=False), 100)
 
 
+class TestBackwardSolver(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        for numbers, random_target in _random_cases(7, 500, 12, 200):
+            operators = [rng.choice(['+', '*', '||'])
+                         for _ in range(len(numbers) - 1)]
+            target = numbers[0]
+            for op, number in zip(operators, numbers[1:]):
+                if op == '+':
+                    target += number
+                elif op == '*':
+                    target *= number
+                else:
+                    target = int(str(target) + str(number))
+            for candidate in (target, target + 1, random_target):
+                self.assertEqual(can_reach_target(candidate, numbers),
+                                 can_reach_target_brute_force(candidate, numbers, ['+', '*']))
+                self.assertEqual(
+                    can_reach_target_with_all_ops(candidate, numbers),
+                    can_reach_target_brute_force(candidate, numbers, ['+', '*', '||']))
+
+
+class TestOperatorRegistry(unittest.TestCase):
+
+    def test_forward_and_inverse(self):
+        for symbol in PART2_OPERATORS:
+            operator = OPERATORS[symbol]
+            for left in (0, 1, 7, 12, 100):
+                for right in (0, 1, 3, 10, 45):
+                    result = operator.forward(left, right)
+                    inverse = operator.inverse(result, right)
+                    self.assertTrue(inverse is ANY_LEFT or inverse == left)
+        self.assertEqual(OPERATORS['||'].forward(12, 340), 12340)
+        self.assertEqual(OPERATORS['||'].forward(12, 0), 120)
+
+    def test_operator_without_inverse(self):
+        minus = Operator('-', lambda left, right: left - right)
+        lines = ["4: 10 6", "16: 10 6", "2: 10 6 2"]
+        self.assertEqual(solve_equations(lines, operators=[minus, '+']), 4 + 16 + 2)
+        self.assertEqual(solve_equations(lines, operators=['+', '*']), 16)
+
+    def test_matches_brute_force_forward(self):
+        plain = _without_inverses(PART2_OPERATORS)
+        for numbers, target in _random_cases(24, 300, 9, 300):
+            self.assertEqual(
+                can_reach(target, numbers, plain),
+                can_reach_target_brute_force(target, numbers, list(PART2_OPERATORS)))
+
+
+class TestSolutionCounting(unittest.TestCase):
+
+    def evaluate(self, expression: str) -> int:
+        tokens = expression.split()
+        value = int(tokens[0])
+        for symbol, number in zip(tokens[1::2], tokens[2::2]):
+            value = OPERATORS[symbol].forward(value, int(number))
+        return value
+
+    def test_example(self):
+        self.assertEqual(count_solutions(3267, [81, 40, 27], PART1_OPERATORS), 2)
+        self.assertEqual(count_solutions(83, [17, 5], PART2_OPERATORS), 0)
+        self.assertIsNone(find_witness(83, [17, 5], PART2_OPERATORS))
+        self.assertEqual(find_witness(156, [15, 6], PART2_OPERATORS), "15 || 6")
+        self.assertEqual(self.evaluate(find_witness(3267, [81, 40, 27], PART1_OPERATORS)),
+                         3267)
+
+    def test_matches_enumeration(self):
+        plain = _without_inverses(PART2_OPERATORS)
+        for numbers, target in _random_cases(25, 300, 9, 120):
+            expected = 0
+            for ops_pattern in product(PART2_OPERATORS, repeat=len(numbers) - 1):
+                value = numbers[0]
+                for symbol, number in zip(ops_pattern, numbers[1:]):
+                    value = OPERATORS[symbol].forward(value, number)
+                expected += value == target
+            for operators in (PART2_OPERATORS, plain):
+                self.assertEqual(count_solutions(target, numbers, operators), expected)
+                witness = find_witness(target, numbers, operators)
+                self.assertEqual(witness is not None, expected > 0)
+                if witness is not None:
+                    self.assertEqual(self.evaluate(witness), target)
+
+
 class TestPart2(unittest.TestCase):
 
     def test_example(self):
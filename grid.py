@@ -0,0 +1,189 @@
+""" Compact character grid shared by the grid puzzles (days 4 and 6)"""
+from typing import Iterable, List, Optional, Tuple
+import unittest
+
+PAD = b"\n"
+
+
+class Grid:
+    """
+    A rectangular character grid stored row-major in a single bytearray.
+
+    Every row is followed by one pad byte and the grid is framed by a pad row above and
+    below, so the stride is cols + 1 and any cell up to one step outside the grid reads
+    as PAD without a bounds check. The layout matches the file format, so loading a file
+    is a single copy.
+    """
+
+    def __init__(self, data: bytearray, rows: int, cols: int):
+        self.data = data
+        self.rows = rows
+        self.cols = cols
+        self.stride = cols + 1
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[Iterable[str]]) -> 'Grid':
+        """
+        Builds a grid from rows given as strings or lists of single-character strings.
+
+        Ragged rows are accepted on purpose: shorter rows are padded with PAD to the width
+        of the longest row, so their missing cells read as outside the grid, like cells
+        past the edge. from_bytes rejects ragged input instead, because file contents are
+        used as-is and a short line would shift every row after it.
+        """
+        encoded = ["".join(line).encode('latin-1') for line in lines]
+        cols = max(map(len, encoded), default=0)
+        stride = cols + 1
+        data = bytearray(PAD * stride)
+        for line in encoded:
+            data += line.ljust(stride, PAD)
+        data += PAD * stride
+        return cls(data, len(encoded), cols)
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> 'Grid':
+        """Builds a grid straight from file contents: equal-length lines separated by newlines."""
+        content = content.rstrip(b"\r\n")
+        if not content:
+            return cls(bytearray(PAD * 2), 0, 0)
+        cols = content.find(b"\n")
+        cols = len(content) if cols == -1 else cols
+        stride = cols + 1
+        rows, ragged = divmod(len(content) + 1, stride)
+        if ragged or content.count(b"\n") != rows - 1:
+            raise ValueError("Grid rows must all have the same length.")
+        data = bytearray(PAD * stride)
+        data += content
+        data += PAD * (stride + 1)
+        return cls(data, rows, cols)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'Grid':
+        with open(file_path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    @classmethod
+    def coerce(cls, grid) -> 'Grid':
+        """Returns the grid itself if it is a Grid, otherwise builds one from its rows."""
+        return grid if isinstance(grid, cls) else cls.from_lines(grid)
+
+    def index(self, r: int, c: int) -> int:
+        """Position of cell (r, c) in data; valid from one cell outside the grid inwards."""
+        return (r + 1) * self.stride + c
+
+    def position(self, index: int) -> Tuple[int, int]:
+        """Cell (r, c) at a position of data."""
+        r, c = divmod(index, self.stride)
+        return r - 1, c
+
+    def at(self, r: int, c: int) -> str:
+        """The character at (r, c), or PAD for a cell just outside the grid."""
+        return chr(self.data[self.index(r, c)])
+
+    def row(self, r: int) -> memoryview:
+        """Zero-copy view of row r."""
+        start = self.index(r, 0)
+        return memoryview(self.data)[start:start + self.cols]
+
+    def column(self, c: int) -> memoryview:
+        """Zero-copy view of column c, top to bottom."""
+        start = self.index(0, c)
+        return memoryview(self.data)[start:start + self.rows * self.stride:self.stride]
+
+    def line(self, r: int, c: int, dr: int, dc: int) -> memoryview:
+        """
+        Zero-copy view of the cells from (r, c) in direction (dr, dc) up to the grid edge.
+
+        Args:
+            r, c: The first cell of the line.
+            dr, dc: The direction, each component -1, 0 or 1 (not both 0).
+
+        Returns:
+            A strided view of the data; empty if (r, c) is outside the grid.
+        """
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            return memoryview(self.data)[0:0]
+        limits = []
+        if dr:
+            limits.append(self.rows - r if dr > 0 else r + 1)
+        if dc:
+            limits.append(self.cols - c if dc > 0 else c + 1)
+        length = min(limits)
+        step = dr * self.stride + dc
+        start = self.index(r, c)
+        stop = start + step * length
+        return memoryview(self.data)[start:stop if stop >= 0 else None:step]
+
+    def find(self, char: str, start: Tuple[int, int] = (0, 0)) -> Optional[Tuple[int, int]]:
+        """The first cell holding char in row-major order from start, or None."""
+        found = self.data.find(char.encode('latin-1'), self.index(*start))
+        return None if found == -1 else self.position(found)
+
+    def find_all(self, char: str) -> List[Tuple[int, int]]:
+        """All cells holding char, in row-major order."""
+        needle = char.encode('latin-1')
+        cells = []
+        found = self.data.find(needle)
+        while found != -1:
+            cells.append(self.position(found))
+            found = self.data.find(needle, found + 1)
+        return cells
+
+    def lines(self) -> List[str]:
+        """The rows as strings."""
+        return [bytes(self.row(r)).decode('latin-1') for r in range(self.rows)]
+
+
+class TestGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid.from_lines(["abc", "de#", "#hi"])
+
+    def test_loaders_agree(self):
+        from_bytes = Grid.from_bytes(b"abc\nde#\n#hi\n")
+        self.assertEqual(from_bytes.data, self.grid.data)
+        self.assertEqual((from_bytes.rows, from_bytes.cols), (3, 3))
+        self.assertEqual(Grid.from_lines([list("abc"), list("de#"), list("#hi")]).data,
+                         self.grid.data)
+        self.assertIs(Grid.coerce(self.grid), self.grid)
+        self.assertEqual(self.grid.lines(), ["abc", "de#", "#hi"])
+        with self.assertRaises(ValueError):
+            Grid.from_bytes(b"abc\nde\n")
+        with self.assertRaises(ValueError):
+            Grid.from_bytes(b"a\nbcd")
+
+    def test_ragged_lines_are_padded(self):
+        grid = Grid.from_lines(["ab", "c", "def"])
+        self.assertEqual((grid.rows, grid.cols), (3, 3))
+        self.assertEqual(grid.at(1, 0), "c")
+        self.assertEqual(grid.at(1, 1), PAD.decode())
+        self.assertEqual(grid.at(0, 2), PAD.decode())
+
+    def test_empty(self):
+        for grid in (Grid.from_lines([]), Grid.from_bytes(b"")):
+            self.assertEqual((grid.rows, grid.cols), (0, 0))
+            self.assertEqual(grid.find_all("#"), [])
+
+    def test_padded_access(self):
+        self.assertEqual(self.grid.at(1, 1), "e")
+        for r, c in ((-1, -1), (-1, 1), (1, -1), (1, 3), (3, 3), (3, -1)):
+            self.assertEqual(self.grid.at(r, c), PAD.decode())
+
+    def test_views(self):
+        self.assertEqual(bytes(self.grid.row(1)), b"de#")
+        self.assertEqual(bytes(self.grid.column(0)), b"ad#")
+        self.assertEqual(bytes(self.grid.line(0, 0, 1, 1)), b"aei")
+        self.assertEqual(bytes(self.grid.line(2, 2, -1, -1)), b"iea")
+        self.assertEqual(bytes(self.grid.line(0, 2, 1, -1)), b"ce#")
+        self.assertEqual(bytes(self.grid.line(2, 0, -1, 0)), b"#da")
+        self.assertEqual(bytes(self.grid.line(1, 2, 0, -1)), b"#ed")
+
+    def test_find(self):
+        self.assertEqual(self.grid.find("#"), (1, 2))
+        self.assertEqual(self.grid.find("#", (1, 3)), (2, 0))
+        self.assertIsNone(self.grid.find("z"))
+        self.assertEqual(self.grid.find_all("#"), [(1, 2), (2, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()